@@ -0,0 +1,355 @@
+#!/usr/bin/python3
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from glob import glob
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'similarity_baselines'))
+
+
+# Synthetic string formats, one `tests/homo`-style dataset each.
+FORMATS = {
+    'phones': lambda r: '%03d-%03d-%04d' % (r.randint(200, 999), r.randint(0, 999), r.randint(0, 9999)),
+    'dates': lambda r: '%02d/%02d/%04d' % (r.randint(1, 12), r.randint(1, 28), r.randint(1900, 2020)),
+    'years': lambda r: '%d' % r.randint(1900, 2020),
+    'decimals': lambda r: '%d.%02d' % (r.randint(0, 99999), r.randint(0, 99)),
+    'emails': lambda r: '%s@%s.com' % (_word(r, 3, 10), _word(r, 3, 8)),
+    'urls': lambda r: 'http://www.%s.com/%s/' % (_word(r, 4, 12), _word(r, 2, 16)),
+    'codes': lambda r: ''.join(r.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(8)),
+    'ipv4': lambda r: '.'.join(str(r.randint(0, 255)) for _ in range(4)),
+}
+
+NMI_MUS = (1, 2, 3)
+NMI_THETAS = (1, 1.5, 2)
+
+
+def _word(r, lo, hi):
+    return ''.join(r.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(r.randint(lo, hi)))
+
+
+def generate(root_dir, scale, seed=0):
+    # Writes `scale` strings per dataset under tests/homo, `scale` records to
+    # logs/Similarity.FlashProfile.log, `scale` test cases to TestResult.xml and
+    # a small (mu, theta) grid of NMI logs with about `scale` data rows each.
+    r = random.Random(seed)
+    homo_dir = os.path.join(root_dir, 'tests', 'homo')
+    logs_dir = os.path.join(root_dir, 'logs')
+    os.makedirs(homo_dir, exist_ok=True)
+    os.makedirs(logs_dir, exist_ok=True)
+
+    data = {}
+    for name, fmt in FORMATS.items():
+        data[name] = [fmt(r) for _ in range(scale)]
+        with open(os.path.join(homo_dir, name + '.json'), 'w', encoding='utf8') as f:
+            json.dump({'Source': 'synthetic', 'Data': data[name]}, f, indent=2)
+
+    names = list(data)
+    with open(os.path.join(logs_dir, 'Similarity.FlashProfile.log'), 'w') as f:
+        for _ in range(scale):
+            a, b = r.choice(names), r.choice(names)
+            f.write('%5s  |  [%5d] @ %8.5f :: %96s\n       => "%s"\n       => "%s"\n' %
+                    (a == b, r.randint(0, 99999), r.random() * 3, '[Digit]+',
+                     r.choice(data[a]), r.choice(data[b])))
+
+    rows = max(1, scale // 500)
+    for mu in NMI_MUS:
+        for theta in NMI_THETAS:
+            with open(os.path.join(logs_dir, 'NMI-%gx%g.log' % (mu, theta)), 'w') as f:
+                for n in range(2, 9):
+                    f.write('\n\nN = %d ... \n' % n)
+                    for _ in range(10):
+                        f.write('\n\n%s\nData:\n' % ('=' * 40))
+                        for j in range(rows):
+                            f.write('  [#] %s = %s\n' % (names[j % len(names)],
+                                                       '  .-.  '.join(r.choice(data[names[j % len(names)]])
+                                                                      for _ in range(8))))
+                        f.write('\nProfile:\n  [$] [Digit]+\n\nClusters\n  [=]  a  .-.  b\n')
+                        f.write('\n%4.2f @ %5dms\n' % (r.random(), r.randint(100, 99999)))
+                    f.write('\n\nSum(Time) = 0ms\nAvg(Time) = 0s\nAvg(NMI) = 0\n')
+
+    with open(os.path.join(root_dir, 'TestResult.xml'), 'w') as f:
+        f.write('<?xml version="1.0" encoding="utf-8" standalone="no"?>\n'
+                '<test-run id="2" testcasecount="%d">\n<test-suite type="TestFixture" name="ProfilingTests">\n' % scale)
+        for i in range(scale):
+            f.write('<test-case id="0-%d" name="TestBestDescription(tests/homo/file_%d.json)" '
+                    'result="Passed" duration="%.6f" asserts="1">\n'
+                    '<output><![CDATA[clusters=%d,avg_len=%.2f,entries=%d,auto=%s]]></output>\n</test-case>\n' %
+                    (i, i, r.random() * 8, r.randint(1, 9), r.random() * 40, r.randint(1, 1 << 20),
+                     r.random() < 0.5))
+        f.write('</test-suite>\n</test-run>\n')
+
+
+def _combination(scale):
+    # Pairs per dataset for the training stages, growing with the scale.
+    return max(1, scale // 10), max(1, int(scale ** 0.5) // 4)
+
+
+def _counts(root_dir):
+    from common.datasets import load_data
+    from features import string_counts
+    files = sorted(glob(os.path.join(root_dir, 'tests', 'homo', '*.json')))
+    counts = [string_counts(load_data(f, root_dir)) for f in files]
+    return np.concatenate(counts), np.cumsum([0] + [len(c) for c in counts[:-1]]), [len(c) for c in counts]
+
+
+def _pairs(root_dir, scale):
+    from pairs import sample_pairs
+    from train import SEED
+    counts, offsets, sizes = _counts(root_dir)
+    return counts, offsets, sample_pairs(sizes, *_combination(scale), rng=random.Random(SEED))
+
+
+def _test_features(root_dir):
+    from common.simlog import load_similarity_log
+    from features import packed_features
+    log = load_similarity_log(os.path.join(root_dir, 'logs', 'Similarity.FlashProfile.log'))
+    return log, packed_features(log.strings)
+
+
+def _model(root_dir, scale):
+    from train import _init_worker, train_model
+    model_file = os.path.join(root_dir, 'logs', 'RandomForest.bench.pkl')
+    if not os.path.exists(model_file):
+        counts, offsets, pairs = _pairs(root_dir, scale)
+        _init_worker(counts, offsets)
+        train_model(pairs, model_file)
+    return model_file
+
+
+# Every stage is (setup, run, unit): setup(root_dir, scale) prepares the
+# inputs outside of the measurement, and run(root_dir, scale, inputs) returns
+# the number of units it processed.
+
+def _run_datasets(root_dir, scale, _):
+    from common.datasets import load_dataset
+    from common.hashes import cache_dir
+    shutil.rmtree(os.path.join(cache_dir(root_dir), 'datasets'), ignore_errors=True)
+    return sum(len(load_dataset(f, root_dir))
+               for f in glob(os.path.join(root_dir, 'tests', 'homo', '*.json')))
+
+
+def _run_counts(root_dir, scale, _):
+    return len(_counts(root_dir)[0])
+
+
+def _run_pairs(root_dir, scale, inputs):
+    from pairs import sample_pairs
+    counts, offsets, sizes = inputs
+    return len(sample_pairs(sizes, *_combination(scale), rng=random.Random(0)).labels)
+
+
+def _run_features(root_dir, scale, inputs):
+    from pairs import build_features
+    counts, offsets, pairs = inputs
+    return len(build_features(counts, offsets, pairs))
+
+
+def _run_fit(root_dir, scale, inputs):
+    from train import _init_worker, train_model
+    counts, offsets, pairs = inputs
+    _init_worker(counts, offsets)
+    return train_model(pairs, os.path.join(root_dir, 'logs', 'RandomForest.fit.pkl'))[1]
+
+
+def _setup_simlog(root_dir, scale):
+    path = os.path.join(root_dir, 'logs', 'Similarity.FlashProfile.log')
+    shutil.rmtree(path + '.cols', ignore_errors=True)
+
+
+def _run_simlog(root_dir, scale, _):
+    from common.simlog import read_similarity_log
+    return len(read_similarity_log(os.path.join(root_dir, 'logs', 'Similarity.FlashProfile.log')).labels)
+
+
+def _run_jaro_winkler(root_dir, scale, inputs):
+    from scoring import packed_jaro_winkler_scores
+    log, features = inputs
+    return len(packed_jaro_winkler_scores(log.strings))
+
+
+def _setup_predict(root_dir, scale):
+    return _model(root_dir, scale), _test_features(root_dir)[1]
+
+
+def _run_predict(root_dir, scale, inputs):
+    from scoring import load_model, predict_models
+    model_file, features = inputs
+    return predict_models([load_model(model_file)], features).shape[1]
+
+
+def _run_pr_curve(root_dir, scale, inputs):
+    from common.metrics import pr_auc, precision_recall
+    log = inputs[0]
+    precision, recall, _ = precision_recall(log.labels, log.scores)
+    pr_auc(precision, recall)
+    return len(log.labels)
+
+
+def _run_nmilog(root_dir, scale, _):
+    from common.nmilog import read_results
+    paths = glob(os.path.join(root_dir, 'logs', 'NMI-*.log'))
+    for path in paths:
+        read_results(path)
+    return sum(os.path.getsize(path) for path in paths) / float(1 << 20)
+
+
+def _run_testresult(root_dir, scale, _):
+    from common.testresult import read_test_cases
+    return len(read_test_cases(os.path.join(root_dir, 'TestResult.xml')))
+
+
+STAGES = [
+    ('datasets', None, _run_datasets, 'strings'),
+    ('counts', None, _run_counts, 'strings'),
+    ('pairs', lambda root_dir, scale: _counts(root_dir), _run_pairs, 'pairs'),
+    ('features', _pairs, _run_features, 'pairs'),
+    ('fit', _pairs, _run_fit, 'pairs'),
+    ('simlog', _setup_simlog, _run_simlog, 'records'),
+    ('jaro-winkler', lambda root_dir, scale: _test_features(root_dir), _run_jaro_winkler, 'pairs'),
+    ('predict', _setup_predict, _run_predict, 'pairs'),
+    ('pr-curve', lambda root_dir, scale: _test_features(root_dir), _run_pr_curve, 'pairs'),
+    ('nmilog', None, _run_nmilog, 'MB'),
+    ('testresult', None, _run_testresult, 'cases'),
+]
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_stage(name, root_dir, scale):
+    # Runs in a fresh process, so that the peak RSS is that of this stage alone
+    # (plus its setup, which is reported separately).
+    setup, run, unit = next(s[1:] for s in STAGES if s[0] == name)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        inputs = None if setup is None else setup(root_dir, scale)
+        rss_before = _max_rss_mb()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        items = run(root_dir, scale, inputs)
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    return {'stage': name, 'scale': scale, 'unit': unit, 'items': items,
+            'seconds': wall, 'cpu_seconds': cpu, 'throughput': items / max(wall, 1e-9),
+            'setup_rss_mb': rss_before, 'peak_rss_mb': _max_rss_mb()}
+
+
+def benchmark(stages, scales, repeat=3, data_dir=None):
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for scale in scales:
+        root_dir = tempfile.mkdtemp(prefix='bench.%d.' % scale, dir=data_dir)
+        try:
+            print('+ Generating inputs at scale %d ...' % scale)
+            generate(root_dir, scale)
+            for name in stages:
+                runs = []
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(1, mp_context=context) as executor:
+                        try:
+                            runs.append(executor.submit(run_stage, name, root_dir, scale).result())
+                        except Exception:
+                            traceback.print_exc()
+                            break
+                if not runs:
+                    print('! %-12s @ %8d :: FAILED' % (name, scale))
+                    results.append({'stage': name, 'scale': scale, 'error': True})
+                    continue
+                best = dict(min(runs, key=lambda run: run['seconds']))
+                best['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+                best['repeat'] = len(runs)
+                results.append(best)
+                print('> %-12s @ %8d :: %9.4f s  %12.1f %s/s  %8.1f MB peak' %
+                      (name, scale, best['seconds'], best['throughput'], best['unit'],
+                       best['peak_rss_mb']))
+        finally:
+            if data_dir is None:
+                shutil.rmtree(root_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Stages whose throughput dropped by more than `threshold` (a fraction)
+    # against the baseline run at the same scale.
+    known = {(r['stage'], r['scale']): r for r in baseline['results'] if 'throughput' in r}
+    regressions = []
+    for r in results:
+        base = known.get((r['stage'], r['scale']))
+        if base is None or 'throughput' not in r:
+            continue
+        change = r['throughput'] / base['throughput'] - 1
+        flag = '!' if change < -threshold else ' '
+        print('%s %-12s @ %8d :: %+7.1f%%' % (flag, r['stage'], r['scale'], 100 * change))
+        if change < -threshold:
+            regressions.append((r['stage'], r['scale'], change))
+    return regressions
+
+
+def main(args):
+    stages = args['stages'] or [s[0] for s in STAGES]
+    unknown = set(stages) - {s[0] for s in STAGES}
+    if unknown:
+        print('! Unknown stages: %s' % ', '.join(sorted(unknown)))
+        return 2
+
+    results = benchmark(stages, args['scales'], args['repeat'], args['data_dir'])
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args['output'])), exist_ok=True)
+    with open(args['output'], 'w') as f:
+        json.dump(report, f, indent=2)
+    print('> Results saved to %s' % args['output'])
+
+    failed = any(r.get('error') for r in results)
+    if args['compare']:
+        with open(args['compare'], 'r') as f:
+            baseline = json.load(f)
+        print('\n> Throughput vs %s (threshold %0.1f%%):' % (args['compare'], 100 * args['threshold']))
+        regressions = compare(results, baseline, args['threshold'])
+        if regressions:
+            print('! %d regression(s)' % len(regressions))
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='bench')
+    parser.add_argument('-s', '--scales', type=int, nargs='+', default=[1000, 10000],
+                        help='Strings per dataset / records per log to benchmark at')
+    parser.add_argument('-t', '--stages', nargs='+', default=None,
+                        help='Stages to run (default: all of %s)' % ', '.join(s[0] for s in STAGES))
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Runs per stage; the fastest is reported')
+    parser.add_argument('-o', '--output', default=os.path.join(root_dir, 'logs', 'benchmark.json'))
+    parser.add_argument('-d', '--data-dir', default=None,
+                        help='Keep the generated inputs under this directory')
+    parser.add_argument('-c', '--compare', default=None, metavar='BASELINE',
+                        help='A previous results file to check throughput against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative throughput drop that counts as a regression')
+    args = parser.parse_args()
+
+    sys.exit(main(args.__dict__))
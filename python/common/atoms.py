@@ -0,0 +1,224 @@
+import glob
+import os
+
+import numpy as np
+
+from collections import deque, namedtuple
+
+from common.datasets import ROOT_DIR
+
+
+ATOMS_DIR = os.path.join(ROOT_DIR, 'semantic_atoms')
+
+# Totals of `AtomMatcher.scan` over a batch of strings: per atom, how many
+# positions start a longest match of that atom (`hits`) and how many strings
+# have at least one (`strings_hit`); and per string, the fraction of its
+# characters covered by some match.
+AtomScan = namedtuple('AtomScan', ['atoms', 'hits', 'strings_hit', 'covered_chars', 'total_chars',
+                                   'string_coverage'])
+
+
+def load_atoms(atoms_dir=ATOMS_DIR):
+    # {name: (words, case_sensitive)} of every *.nocase / *.case dictionary,
+    # the way the C# side builds its TrieAtoms.
+    atoms = {}
+    for ext, case_sensitive in (('.nocase', False), ('.case', True)):
+        for path in sorted(glob.glob(os.path.join(atoms_dir, '**', '*' + ext), recursive=True)):
+            with open(path, 'r', encoding='utf8') as f:
+                words = [line.rstrip('\r\n') for line in f]
+            atoms[os.path.splitext(os.path.basename(path))[0]] = ([w for w in words if w], case_sensitive)
+    return atoms
+
+
+class Automaton:
+    # Aho-Corasick automaton over `words` ({word: atom bitmask}), compiled to
+    # a dense (state x symbol) transition table. Symbol 0 stands for every
+    # character outside the dictionaries. With `fold_case` words and text are
+    # compared upper-cased, as by TrieAtom.
+
+    def __init__(self, words, fold_case):
+        keys = {}
+        for word, mask in words.items():
+            key = word.upper() if fold_case else word
+            keys[key] = keys.get(key, 0) | mask
+
+        symbols = {}
+        for symbol, c in enumerate(sorted(set(''.join(keys))), 1):
+            symbols[ord(c)] = symbol
+            # Characters that upper-case to c share its symbol.
+            if fold_case and len(c.lower()) == 1 and c.lower().upper() == c:
+                symbols.setdefault(ord(c.lower()), symbols[ord(c)])
+        codes = sorted(symbols)
+        self.codes = np.array(codes, dtype=np.uint32)
+        self.code_symbols = np.array([symbols[c] for c in codes], dtype=np.int32)
+        self.fold_case = fold_case
+
+        # Trie; `word_masks[s]` is the atom mask of the word spelt by state s.
+        goto, depth, word_masks = [{}], [0], [0]
+        for key, mask in keys.items():
+            s = 0
+            for c in key:
+                symbol = symbols[ord(c)]
+                if symbol not in goto[s]:
+                    goto[s][symbol] = len(goto)
+                    goto.append({})
+                    depth.append(depth[s] + 1)
+                    word_masks.append(0)
+                s = goto[s][symbol]
+            word_masks[s] |= mask
+
+        # Breadth-first failure links fill in the full transition table, and
+        # every state inherits the outputs (words that are its suffixes) of its
+        # failure state.
+        num_symbols = len(set(''.join(keys))) + 1
+        self.max_len = max([0] + [len(k) for k in keys])
+        self.delta = np.zeros((len(goto), num_symbols), dtype=np.int32)
+        self.outputs = np.zeros((len(goto), self.max_len + 1), dtype=np.uint64)
+        fail = [0] * len(goto)
+        queue = deque()
+        for symbol, t in goto[0].items():
+            self.delta[0, symbol] = t
+            queue.append(t)
+        while queue:
+            s = queue.popleft()
+            self.outputs[s] = self.outputs[fail[s]]
+            if word_masks[s]:
+                self.outputs[s, depth[s]] = word_masks[s]
+            for symbol in range(num_symbols):
+                t = goto[s].get(symbol)
+                if t is None:
+                    self.delta[s, symbol] = self.delta[fail[s], symbol]
+                else:
+                    fail[t] = self.delta[fail[s], symbol] if s else 0
+                    self.delta[s, symbol] = t
+                    queue.append(t)
+        self.delta[:, 0] = 0
+        self.has_output = self.outputs.any(axis=1)
+        self.lengths = [n for n in range(1, self.max_len + 1) if self.outputs[:, n].any()]
+
+    def symbols(self, codes):
+        index = np.minimum(np.searchsorted(self.codes, codes), max(0, len(self.codes) - 1))
+        found = (self.codes[index] == codes) if len(self.codes) else np.zeros(codes.shape, bool)
+        return np.where(found, self.code_symbols[index], 0)
+
+    def longest(self, codes):
+        # For a (strings x positions) array of code points (0-padded), the
+        # length and atom mask of the longest match starting at every position.
+        n, m = codes.shape
+        symbols = self.symbols(codes)
+        lengths = np.zeros((n, m), dtype=np.int16)
+        masks = np.zeros((n, m), dtype=np.uint64)
+        state = np.zeros(n, dtype=np.int32)
+        for end in range(m):
+            state = self.delta[state, symbols[:, end]]
+            rows = np.nonzero(self.has_output[state])[0]
+            if len(rows) == 0:
+                continue
+            # Increasing length: the longest match for a start is written last.
+            for length in self.lengths:
+                if length > end + 1:
+                    break
+                mask = self.outputs[state[rows], length]
+                hit = rows[mask != 0]
+                lengths[hit, end - length + 1] = length
+                masks[hit, end - length + 1] = mask[mask != 0]
+        return lengths, masks
+
+
+class AtomMatcher:
+    # All semantic atoms in one case-insensitive automaton (plus one for the
+    # case-sensitive atoms, if any), matched against many strings at once.
+
+    def __init__(self, atoms=None):
+        atoms = load_atoms() if atoms is None else atoms
+        self.names = list(atoms)
+        if len(self.names) > 64:
+            raise ValueError('at most 64 atoms are supported, got %d' % len(self.names))
+        self.automata = []
+        for case_sensitive in (False, True):
+            words = {}
+            for i, name in enumerate(self.names):
+                words_i, case_i = atoms[name]
+                if case_i == case_sensitive:
+                    for w in words_i:
+                        words[w] = words.get(w, 0) | (1 << i)
+            if words:
+                self.automata.append(Automaton(words, fold_case=not case_sensitive))
+
+    def longest(self, codes):
+        lengths = np.zeros(codes.shape, dtype=np.int16)
+        masks = np.zeros(codes.shape, dtype=np.uint64)
+        for automaton in self.automata:
+            l, m = automaton.longest(codes)
+            longer, tie = l > lengths, (l == lengths) & (l > 0)
+            masks[tie] |= m[tie]
+            lengths[longer], masks[longer] = l[longer], m[longer]
+        return lengths, masks
+
+    def matches(self, s):
+        # [(start, length, [atom names])] of the longest match at each position.
+        lengths, masks = self.longest(np.array([[ord(c) for c in s]], dtype=np.uint32).reshape(1, -1))
+        return [(int(i), int(lengths[0, i]),
+                 [name for b, name in enumerate(self.names) if int(masks[0, i]) >> b & 1])
+                for i in np.nonzero(lengths[0])[0]]
+
+    def scan(self, strings, counts=None, chunk_size=1 << 14):
+        # Strings are processed in chunks of similar length to limit padding.
+        # With `counts` (e.g. of a UniqueStrings), the i-th string stands for
+        # counts[i] rows in the totals.
+        strings = list(strings)
+        str_lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        weights = np.ones(len(strings), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        hits = np.zeros(len(self.names), dtype=np.int64)
+        strings_hit = np.zeros(len(self.names), dtype=np.int64)
+        covered = np.zeros(len(strings), dtype=np.int64)
+
+        order = np.argsort(str_lengths, kind='stable')
+        for start in range(0, len(strings), chunk_size):
+            chunk = order[start:start + chunk_size]
+            chunk_lengths = str_lengths[chunk]
+            width = int(chunk_lengths.max()) if len(chunk) else 0
+            if width == 0:
+                continue
+            text = ''.join(strings[i] for i in chunk)
+            codes = np.zeros((len(chunk), width), dtype=np.uint32)
+            rows = np.repeat(np.arange(len(chunk)), chunk_lengths)
+            cols = np.arange(len(rows)) - np.repeat(np.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+            codes[rows, cols] = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+            lengths, masks = self.longest(codes)
+            for b in range(len(self.names)):
+                has = (masks >> np.uint64(b)) & np.uint64(1) != 0
+                hits[b] += int(np.dot(has.sum(axis=1), weights[chunk]))
+                strings_hit[b] += int(weights[chunk][has.any(axis=1)].sum())
+
+            # Characters covered by the union of all matches, via a running
+            # count of match starts minus match ends.
+            r, c = np.nonzero(lengths)
+            bounds = np.zeros((len(chunk), width + 1), dtype=np.int32)
+            np.add.at(bounds, (r, c), 1)
+            np.add.at(bounds, (r, c + lengths[r, c]), -1)
+            covered[chunk] = (np.cumsum(bounds[:, :width], axis=1) > 0).sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            string_coverage = np.where(str_lengths > 0, covered / np.maximum(str_lengths, 1), 0.0)
+        return AtomScan(self.names, hits, strings_hit, int(np.dot(covered, weights)),
+                        int(np.dot(str_lengths, weights)), string_coverage)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='atoms', description='Semantic-atom matches per dataset')
+    parser.add_argument('datasets', nargs='+', help='tests/*/*.json datasets')
+    args = parser.parse_args()
+
+    from common.datasets import load_dataset
+    matcher = AtomMatcher()
+    print('%-40s %8s %9s  %s' % ('dataset', 'strings', 'coverage', '  '.join(matcher.names)))
+    for path in args.datasets:
+        dataset = load_dataset(path)
+        result = matcher.scan(dataset.unique.tolist(), dataset.counts)
+        print('%-40s %8d %8.2f%%  %s' %
+              (os.path.basename(path), len(dataset),
+               100.0 * result.covered_chars / max(1, result.total_chars),
+               '  '.join('%*d' % (len(name), n) for name, n in zip(result.atoms, result.strings_hit))))
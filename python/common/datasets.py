@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from common.hashes import cache_dir, cached_file_hash, hash_memo, save_hash_memo
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+CACHE_VERSION = 2
+
+
+class PackedStrings:
+    # Strings stored as one UTF-8 buffer; string i is buffer[offsets[i]:offsets[i+1]].
+
+    def __init__(self, offsets, buffer):
+        self.offsets = offsets
+        self.buffer = buffer
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode('utf-8', 'surrogatepass') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, buffer)
+
+    @classmethod
+    def load(cls, prefix, mmap_mode='r'):
+        offsets = np.load(prefix + '.offsets.npy', mmap_mode=mmap_mode)
+        if os.path.getsize(prefix + '.strings.bin') == 0:
+            return cls(offsets, np.zeros(0, dtype=np.uint8))
+        if mmap_mode is None:
+            return cls(offsets, np.fromfile(prefix + '.strings.bin', dtype=np.uint8))
+        return cls(offsets, np.memmap(prefix + '.strings.bin', dtype=np.uint8, mode=mmap_mode))
+
+    def save(self, prefix):
+        np.save(prefix + '.offsets.npy', np.asarray(self.offsets))
+        with open(prefix + '.strings.bin', 'wb') as f:
+            f.write(np.asarray(self.buffer).tobytes())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.buffer[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8', 'surrogatepass')
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def slice(self, start, stop):
+        # Strings start..stop-1, sharing this buffer.
+        offsets = np.asarray(self.offsets[start:stop + 1])
+        return PackedStrings(offsets - offsets[0], self.buffer[offsets[0]:offsets[-1]])
+
+    def _char_offsets(self):
+        # Every UTF-8 byte except continuation bytes (0b10xxxxxx) starts a character.
+        starts = np.zeros(len(self.buffer) + 1, dtype=np.int64)
+        np.cumsum((np.asarray(self.buffer) & 0xC0) != 0x80, out=starts[1:])
+        return starts[self.offsets]
+
+    def lengths(self):
+        return np.diff(self._char_offsets())
+
+    def tolist(self):
+        text = bytes(self.buffer).decode('utf-8', 'surrogatepass')
+        bounds = self._char_offsets().tolist()
+        return [text[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+class UniqueStrings:
+    # A dataset with every distinct string stored once: string i is
+    # unique[inverse[i]], and counts[u] is how often unique[u] occurs.
+
+    def __init__(self, unique, inverse, counts):
+        self.unique = unique
+        self.inverse = inverse
+        self.counts = counts
+
+    @classmethod
+    def from_strings(cls, strings):
+        index = {}
+        inverse = np.fromiter((index.setdefault(s, len(index)) for s in strings),
+                              dtype=np.int32, count=len(strings))
+        counts = np.bincount(inverse, minlength=len(index)).astype(np.int32)
+        return cls(PackedStrings.from_strings(list(index)), inverse, counts)
+
+    @classmethod
+    def load(cls, prefix, mmap_mode='r'):
+        return cls(PackedStrings.load(prefix, mmap_mode),
+                   np.load(prefix + '.inverse.npy', mmap_mode=mmap_mode),
+                   np.load(prefix + '.counts.npy', mmap_mode=mmap_mode))
+
+    def save(self, prefix):
+        self.unique.save(prefix)
+        np.save(prefix + '.inverse.npy', np.asarray(self.inverse))
+        np.save(prefix + '.counts.npy', np.asarray(self.counts))
+
+    def __len__(self):
+        return len(self.inverse)
+
+    def __getitem__(self, i):
+        return self.unique[self.inverse[i]]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def unique_lengths(self):
+        return self.unique.lengths()
+
+    def lengths(self):
+        return self.unique_lengths()[self.inverse]
+
+    def tolist(self):
+        unique = self.unique.tolist()
+        return [unique[u] for u in self.inverse.tolist()]
+
+
+def parse_dataset(path):
+    with open(path, 'r', encoding='utf8') as f:
+        return json.load(f)['Data']
+
+
+def _cache_prefix(path, cache_dir):
+    key = hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()[:12]
+    return os.path.join(cache_dir, '%s.%s' % (os.path.splitext(os.path.basename(path))[0], key))
+
+
+def _load_cached(path, stat, root_dir):
+    prefix = _cache_prefix(path, os.path.join(cache_dir(root_dir), 'datasets'))
+    try:
+        with open(prefix + '.json', 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    if (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+        # Touched but possibly unchanged: fall back to comparing content hashes.
+        if (meta['size'] != stat.st_size or
+                meta['sha1'] != cached_file_hash(path, hash_memo(root_dir))):
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        _write_meta(prefix, meta)
+    try:
+        return UniqueStrings.load(prefix)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(prefix, meta):
+    with open(prefix + '.json.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(prefix + '.json.tmp', prefix + '.json')
+
+
+def _store_cached(path, stat, strings, root_dir):
+    datasets_dir = os.path.join(cache_dir(root_dir), 'datasets')
+    prefix = _cache_prefix(path, datasets_dir)
+    try:
+        os.makedirs(datasets_dir, exist_ok=True)
+        strings.save(prefix)
+        _write_meta(prefix, {'version': CACHE_VERSION,
+                             'path': path,
+                             'mtime_ns': stat.st_mtime_ns,
+                             'size': stat.st_size,
+                             'sha1': cached_file_hash(path, hash_memo(root_dir))})
+    except OSError:
+        pass
+
+
+_loaded = {}
+
+
+def load_dataset(path, root_dir=ROOT_DIR):
+    # The `Data` strings of a tests/*.json dataset as `UniqueStrings`, parsed
+    # at most once per process and, across processes, served from a
+    # memory-mapped on-disk copy under the cache of root_dir (None to skip it).
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    if path in _loaded and _loaded[path][0] == (stat.st_mtime_ns, stat.st_size):
+        return _loaded[path][1]
+
+    strings = None if root_dir is None else _load_cached(path, stat, root_dir)
+    if strings is None:
+        strings = UniqueStrings.from_strings(parse_dataset(path))
+        if root_dir is not None:
+            _store_cached(path, stat, strings, root_dir)
+    _loaded[path] = ((stat.st_mtime_ns, stat.st_size), strings)
+    return strings
+
+
+def load_data(path, root_dir=ROOT_DIR):
+    return load_dataset(path, root_dir).tolist()
+
+
+DATASET_DIRS = ('tests/hetero', 'tests/homo', 'tests/homo.simple')
+
+
+def list_datasets(src):
+    paths = []
+    for root, dirs, filenames in os.walk(src):
+        for f in filenames:
+            paths.append(os.path.join(src, f))
+    return paths
+
+
+def length_stats(lengths, counts=None):
+    # Stats of `lengths`, each repeated `counts` times; the same values as
+    # np.median / np.mean over the repeated lengths.
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if counts is None:
+        counts = np.ones(len(lengths), dtype=np.int64)
+    order = np.argsort(lengths, kind='stable')
+    lengths, counts = lengths[order], np.asarray(counts, dtype=np.int64)[order]
+    ends = np.cumsum(counts)
+    n = int(ends[-1])
+    middle = lengths[np.searchsorted(ends, [(n - 1) // 2, n // 2], side='right')]
+    return {
+        'strings': n,
+        'min_len': int(lengths[0]),
+        'med_len': float(np.mean(middle)),
+        'avg_len': float(np.dot(lengths, counts) / n),
+        'max_len': int(lengths[-1]),
+    }
+
+
+def _dataset_stats(path, root_dir):
+    dataset = load_dataset(path, root_dir)
+    return length_stats(dataset.unique_lengths(), dataset.counts)
+
+
+def dataset_stats(paths, jobs=1, root_dir=ROOT_DIR):
+    # Length statistics of every dataset, cached by content hash so that only
+    # new or modified files are loaded; those are scanned on `jobs` processes.
+    cache_path = os.path.join(cache_dir(root_dir), 'data_stats.json')
+    try:
+        with open(cache_path, 'r') as f:
+            stats = json.load(f).get('stats', {})
+    except (OSError, ValueError):
+        stats = {}
+
+    keys = [cached_file_hash(path, hash_memo(root_dir)) for path in paths]
+
+    missing = {}
+    for path, key in zip(paths, keys):
+        if key not in stats:
+            missing.setdefault(key, path)
+    if missing:
+        if jobs > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(min(jobs, len(missing))) as executor:
+                results = list(executor.map(_dataset_stats, missing.values(),
+                                            [root_dir] * len(missing)))
+        else:
+            results = [_dataset_stats(path, root_dir) for path in missing.values()]
+        stats.update(zip(missing.keys(), results))
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path + '.tmp', 'w') as f:
+            json.dump({'stats': stats}, f)
+        os.replace(cache_path + '.tmp', cache_path)
+    except OSError:
+        pass
+    save_hash_memo(root_dir)
+    return [dict(stats[key]) for key in keys]
+
+
+def load_stats(dirs=DATASET_DIRS, jobs=1, root_dir=ROOT_DIR):
+    # Stats of every dataset under `dirs`, in the order data_stats.py plots them.
+    paths = [path for src in dirs for path in list_datasets(os.path.join(root_dir, src))]
+    return dataset_stats(paths, jobs, root_dir)
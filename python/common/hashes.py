@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+
+
+# Only the standard library is imported here, so that entry points can hash
+# their inputs before deciding whether numpy and friends are needed at all.
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cached_file_hash(path, hashes):
+    # `file_hash` of path, memoised in `hashes` ({realpath: [mtime_ns, size, sha1]})
+    # so that files whose mtime and size are unchanged are not read again.
+    stat = os.stat(path)
+    key = os.path.realpath(path)
+    known = hashes.get(key)
+    if known is None or known[:2] != [stat.st_mtime_ns, stat.st_size]:
+        hashes[key] = [stat.st_mtime_ns, stat.st_size, file_hash(path)]
+    return hashes[key][2]
+
+
+def cache_dir(root_dir):
+    # Every cache derived from the inputs under root_dir lives here.
+    return os.path.join(root_dir, 'logs', 'cache')
+
+
+_memos = {}
+
+
+def hash_memo(root_dir):
+    # The `cached_file_hash` memo shared by every cache under root_dir, read
+    # from disk once per process.
+    path = os.path.join(cache_dir(os.path.realpath(root_dir)), 'hashes.json')
+    if path not in _memos:
+        _memos[path] = _read_memo(path)
+    return _memos[path]
+
+
+def _read_memo(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hash_memo(root_dir, hashes=None):
+    # Writes the memo of root_dir (after merging `hashes` into it), keeping
+    # entries other processes have saved in the meantime.
+    memo = hash_memo(root_dir)
+    if hashes is not None:
+        memo.update(hashes)
+    path = os.path.join(cache_dir(os.path.realpath(root_dir)), 'hashes.json')
+    merged = _read_memo(path)
+    merged.update(memo)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.%d.tmp' % os.getpid(), 'w') as f:
+            json.dump(merged, f)
+        os.replace(path + '.%d.tmp' % os.getpid(), path)
+    except OSError:
+        pass
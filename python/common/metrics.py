@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def precision_recall(labels, scores):
+    # The points of sklearn.metrics.precision_recall_curve (as of the 0.19/0.20
+    # releases this artifact targets), from a single stable sort of `scores`.
+    labels = np.asarray(labels)
+    scores = np.asarray(scores)
+    order = np.argsort(scores, kind='mergesort')[::-1]
+    scores, labels = scores[order], labels[order]
+
+    thresholds = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tps = np.cumsum(labels == 1, dtype=np.float64)[thresholds]
+    fps = 1 + thresholds - tps
+
+    precision = tps / (tps + fps)
+    recall = tps / tps[-1]
+
+    # Thresholds beyond full recall are dropped; outputs go by decreasing recall.
+    last = tps.searchsorted(tps[-1])
+    sl = slice(last, None, -1)
+    return np.r_[precision[sl], 1], np.r_[recall[sl], 0], scores[thresholds][sl]
+
+
+def auc(x, y, reorder=False):
+    # Trapezoidal area under (x, y), like sklearn.metrics.auc.
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    direction = 1
+    if reorder:
+        order = np.lexsort((y, x))
+        x, y = x[order], y[order]
+    else:
+        dx = np.diff(x)
+        if np.any(dx < 0):
+            if not np.all(dx <= 0):
+                raise ValueError('x is neither increasing nor decreasing: %s' % x)
+            direction = -1
+    return direction * np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2.0)
+
+
+def pr_auc(precision, recall):
+    # The area under a precision/recall curve, as every script reports it.
+    return auc(recall, precision, reorder=True)
+
+
+def downsample(precision, recall, points):
+    # At most `points` evenly spaced points of the curve, keeping both ends.
+    if points is None or len(precision) <= points:
+        return precision, recall
+    keep = np.unique(np.linspace(0, len(precision) - 1, points).round().astype(np.int64))
+    return precision[keep], recall[keep]
+
+
+def write_curve(path, precision, recall, area=None):
+    # With `area`, the AUC of the full curve is recorded on a first "# AUC = "
+    # line, so that it survives rounding and `downsample`.
+    header = 'precision\trecall' if area is None else '# AUC = %r\nprecision\trecall' % float(area)
+    np.savetxt(path, np.column_stack((precision, recall)), fmt='%f',
+               delimiter='\t', header=header, comments='')
+
+
+def read_curve(path):
+    # (precision, recall, AUC); the AUC is the recorded one if there is one,
+    # else `pr_auc` of the points in the file.
+    with open(path, 'r') as f:
+        first = f.readline()
+    area = float(first[len('# AUC = '):]) if first.startswith('# AUC = ') else None
+    precision, recall = np.loadtxt(path, delimiter='\t', skiprows=1 if area is None else 2,
+                                   ndmin=2).T
+    return precision, recall, pr_auc(precision, recall) if area is None else area
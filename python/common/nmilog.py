@@ -0,0 +1,68 @@
+import json
+import os
+import re
+
+import numpy as np
+
+from common.datasets import ROOT_DIR
+from common.hashes import cache_dir
+
+
+NAME = re.compile(r""".*NMI-(.*)x(.*)\.log""")
+RESULT = re.compile(r"""(.*) @ (.*)ms""")
+
+
+def parse_name(path):
+    # (mu, theta) of a `NMI-<mu>x<theta>.log` written by the clustering command.
+    mu, theta = NAME.match(path).groups()
+    return float(mu), float(theta)
+
+
+def read_results(path):
+    # Streams the log and keeps only the per-trial "<nmi> @ <time>ms" lines;
+    # returns NMIs and times in seconds.
+    nmi, time = [], []
+    with open(path, 'r') as f:
+        for line in f:
+            if ' @ ' not in line or 'ms' not in line:
+                continue
+            res = RESULT.match(line)
+            if res is not None:
+                nmi.append(float(res.group(1)))
+                time.append(float(res.group(2)) / 1000.0)
+    return np.array(nmi), np.array(time)
+
+
+def load_results(paths, root_dir=ROOT_DIR):
+    # Like `read_results` for every path, but logs whose path, mtime and size
+    # match the summary cache (in the cache of root_dir) are not read again.
+    cache_path = os.path.join(cache_dir(root_dir), 'nmi_summary.json')
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    summary = {k: v for (k, v) in cache.items() if os.path.exists(k)}
+    results, dirty = {}, len(summary) != len(cache)
+    for path in paths:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = cache.get(key)
+        if entry is None or (entry['mtime_ns'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+            nmi, time = read_results(path)
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                     'nmi': nmi.tolist(), 'time': time.tolist()}
+            dirty = True
+        summary[key] = entry
+        results[path] = (np.array(entry['nmi']), np.array(entry['time']))
+
+    if dirty:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path + '.tmp', 'w') as f:
+                json.dump(summary, f)
+            os.replace(cache_path + '.tmp', cache_path)
+        except OSError:
+            pass
+    return results
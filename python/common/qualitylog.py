@@ -0,0 +1,77 @@
+import re
+
+import numpy as np
+
+from collections import namedtuple
+
+
+NAME = re.compile(r""".*Quality\.FlashProfile\.\s*(.*)x\s*(.*)\.(\d+\.\d+)\.log""")
+
+# Per-dataset columns of a `Quality.FlashProfile.*.log`, with `match` and
+# `mismatch` as fractions of the mismatch sample size, and the F1 reported
+# in its summary (NaN if the run did not finish).
+QualityLog = namedtuple('QualityLog', ['datasets', 'match', 'mismatch', 'score', 'reported_f1'])
+
+RESULTS = {'Match': 1, 'Mismatch': 2, 'Score': 3}
+
+
+def parse_name(path):
+    # (mu, theta, profile fraction) of a log written by the quality command.
+    return tuple(float(v) for v in NAME.match(path).groups())
+
+
+def read_quality_log(path):
+    # One pass over the log; only the "  * Result:" block of every dataset
+    # and the final F1 are parsed.
+    columns = ([], [], [], [])
+    reported_f1 = float('nan')
+    in_result = False
+    with open(path, 'r') as f:
+        for line in f:
+            if in_result:
+                if line.startswith('    + '):
+                    key, _, value = line[6:].partition(' = ')
+                    if key in RESULTS:
+                        columns[RESULTS[key]].append(float(value))
+                        continue
+                in_result = False
+            if line.startswith('> ') and not line.startswith('> Summary:'):
+                columns[0].append(line[2:].rstrip('\n'))
+            elif line == '  * Result:\n':
+                in_result = True
+            elif line.startswith('  * F1 = '):
+                reported_f1 = float(line[len('  * F1 = '):])
+    # A dataset whose result block is cut short (an unfinished run) is dropped.
+    n = min(len(c) for c in columns)
+    return QualityLog(columns[0][:n], *[np.array(c[:n], dtype=np.float64) for c in columns[1:]],
+                      reported_f1=reported_f1)
+
+
+def precision_recall_f1(match, mismatch):
+    # As the quality command computes them: precision is the mean over
+    # datasets of match / (match + mismatch), and recall the mean match.
+    # Works on (..., datasets) arrays, e.g. several logs stacked.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.mean(match / (match + mismatch), axis=-1)
+        recall = np.mean(match, axis=-1)
+        f1 = 2.0 * precision * recall / (precision + recall)
+    return precision, recall, f1
+
+
+def summarise(paths):
+    # One row per log, side by side: its settings, dataset count and scores.
+    rows = []
+    for path in paths:
+        log = read_quality_log(path)
+        precision, recall, f1 = precision_recall_f1(log.match, log.mismatch)
+        try:
+            mu, theta, fraction = parse_name(path)
+        except AttributeError:
+            mu = theta = fraction = float('nan')
+        rows.append((path, mu, theta, fraction, len(log.datasets), float(np.mean(log.score)),
+                     float(precision), float(recall), float(f1)))
+    return np.array(rows, dtype=[('path', 'U%d' % max([1] + [len(p) for p in paths])),
+                                 ('mu', np.float64), ('theta', np.float64), ('fraction', np.float64),
+                                 ('datasets', np.int64), ('score', np.float64),
+                                 ('precision', np.float64), ('recall', np.float64),
+                                 ('f1', np.float64)])
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy as np
+
+from collections import namedtuple
+from itertools import islice
+
+from common.datasets import PackedStrings
+
+
+# Columns of a `Similarity.FlashProfile.log`. `strings` holds the two strings
+# of pair i at positions 2i and 2i + 1.
+SimilarityLog = namedtuple('SimilarityLog', ['labels', 'times', 'scores', 'strings'])
+
+LABELS = {'True': 1, 'False': 0}
+
+
+def parse_header(line):
+    # "{GroundTruth,5}  |  [{SynthesisTime,5}] @ {Score,8:F5} :: {Pattern,96}"
+    head = line.partition(' :: ')[0]
+    label, _, rest = head.partition('|')
+    time = rest[rest.index('[') + 1:rest.index(']')]
+    return LABELS[label.strip()], int(time), float(head.split(' @ ')[1])
+
+
+def parse_string(line):
+    # '       => "{A}"'
+    return line[11:-2] if line.endswith('\n') else line[11:-1]
+
+
+def iter_records(f):
+    # Yields (label, time, score, s1, s2) for every 3-line record written by
+    # the `similarity` command.
+    while True:
+        record = list(islice(f, 3))
+        if len(record) < 3:
+            return
+        yield parse_header(record[0]) + (parse_string(record[1]), parse_string(record[2]))
+
+
+def _reserve(array, size):
+    # Grows `array` in place (doubling) to hold at least `size` items.
+    if len(array) < size:
+        array.resize(max(size, 2 * len(array)), refcheck=False)
+
+
+def read_similarity_log(path, with_strings=True, chunk_size=1 << 16):
+    # Parses `chunk_size` records at a time straight into the output columns,
+    # which grow by doubling and are trimmed at the end; only one chunk of
+    # records is ever held as Python objects.
+    labels = np.empty(chunk_size, dtype=np.int8)
+    times = np.empty(chunk_size, dtype=np.uint32)
+    scores = np.empty(chunk_size, dtype=np.float64)
+    offsets = np.zeros(2 * chunk_size + 1 if with_strings else 1, dtype=np.int64)
+    buffer = np.empty(chunk_size if with_strings else 0, dtype=np.uint8)
+    n = 0
+    with open(path, 'r') as f:
+        records = iter_records(f)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            m = n + len(chunk)
+            for column in (labels, times, scores):
+                _reserve(column, m)
+            labels[n:m] = [r[0] for r in chunk]
+            times[n:m] = [r[1] for r in chunk]
+            scores[n:m] = [r[2] for r in chunk]
+            if with_strings:
+                packed = PackedStrings.from_strings([s for r in chunk for s in r[3:]])
+                start = offsets[2 * n]
+                _reserve(offsets, 2 * m + 1)
+                _reserve(buffer, start + len(packed.buffer))
+                offsets[2 * n + 1:2 * m + 1] = packed.offsets[1:] + start
+                buffer[start:start + len(packed.buffer)] = packed.buffer
+            n = m
+            if len(chunk) < chunk_size:
+                break
+
+    for column in (labels, times, scores):
+        column.resize(n, refcheck=False)
+    strings = None
+    if with_strings:
+        offsets.resize(2 * n + 1, refcheck=False)
+        buffer.resize(int(offsets[-1]), refcheck=False)
+        strings = PackedStrings(offsets, buffer)
+    return SimilarityLog(labels, times, scores, strings)
+
+
+def sidecar_path(path):
+    return path + '.cols'
+
+
+def write_sidecar(log, path):
+    # Columns go to raw .npy files (and the pair strings to an offsets + bytes
+    # blob) next to the log; meta.json is written last and records the log it
+    # was built from.
+    stat = os.stat(path)
+    prefix = sidecar_path(path)
+    os.makedirs(prefix, exist_ok=True)
+    meta = os.path.join(prefix, 'meta.json')
+    if os.path.exists(meta):
+        os.remove(meta)
+    for column in ('labels', 'times', 'scores'):
+        np.save(os.path.join(prefix, column + '.npy'), getattr(log, column))
+    log.strings.save(os.path.join(prefix, 'strings'))
+    with open(meta + '.tmp', 'w') as f:
+        json.dump({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                   'records': len(log.labels)}, f)
+    os.replace(meta + '.tmp', meta)
+
+
+def read_sidecar(path, with_strings=True):
+    # Memory-maps the sidecar of `path`, or returns None if it is missing or
+    # older than the log.
+    prefix = sidecar_path(path)
+    try:
+        with open(os.path.join(prefix, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        stat = os.stat(path)
+        if (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        columns = [np.load(os.path.join(prefix, column + '.npy'), mmap_mode='r')
+                   for column in ('labels', 'times', 'scores')]
+        strings = PackedStrings.load(os.path.join(prefix, 'strings')) if with_strings else None
+    except (OSError, ValueError, KeyError):
+        return None
+    return SimilarityLog(*columns, strings)
+
+
+def load_similarity_log(path, with_strings=True):
+    log = read_sidecar(path, with_strings)
+    if log is not None:
+        return log
+    log = read_similarity_log(path)
+    try:
+        write_sidecar(log, path)
+    except OSError:
+        pass
+    return log if with_strings else log._replace(strings=None)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='simlog')
+    parser.add_argument('logs', nargs='+', help='Similarity logs to convert')
+    args = parser.parse_args()
+
+    for path in args.logs:
+        if read_sidecar(path, with_strings=False) is None:
+            write_sidecar(read_similarity_log(path), path)
+            print('> Converted %s to %s' % (path, sidecar_path(path)))
+        else:
+            print('> %s is up to date' % sidecar_path(path))
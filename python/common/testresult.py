@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+from xml.etree.ElementTree import iterparse
+
+
+FIELDS = [('duration', np.float64), ('clusters', np.int64), ('avg_len', np.float64),
+          ('entries', np.int64), ('auto', np.bool_)]
+
+
+def iter_test_cases(path):
+    # Yields (name, duration, clusters, avg_len, entries, auto) for every
+    # <test-case> of an NUnit TestResult.xml, whose <output> is the
+    # "clusters=..,avg_len=..,entries=..,auto=.." info of ProfilingTests.
+    context = iterparse(path, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'test-case':
+            continue
+        clusters, avg_len, entries, auto = [e.split('=')[1] for e in
+                                            (elem.findtext('output') or '').strip().split(',')]
+        yield (os.path.splitext(os.path.basename(elem.get('name')))[0],
+               float(elem.get('duration')), int(clusters), float(avg_len),
+               int(entries), auto == 'True')
+        elem.clear()
+        root.clear()
+
+
+def read_test_cases(path):
+    columns = list(zip(*iter_test_cases(path))) or [[]] * (len(FIELDS) + 1)
+    names = columns[0]
+    dtype = [('name', 'U%d' % max([1] + [len(n) for n in names]))] + FIELDS
+    data = np.empty(len(names), dtype=dtype)
+    for (field, _), column in zip(dtype, columns):
+        data[field] = column
+    return data
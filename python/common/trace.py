@@ -0,0 +1,162 @@
+import cProfile
+import json
+import os
+import resource
+import time
+
+
+# Stage tracing, off unless FP_TRACE (or the --trace option of train.py,
+# test.py and plot.py) names a JSON-lines file to append to. FP_PROFILE=<stage>
+# (--profile) additionally runs that stage (by name, e.g. "test.predict", or by
+# its nested path, e.g. "plot.quality/render") under cProfile and dumps the
+# stats next to the trace file.
+TRACE_PATH = os.environ.get('FP_TRACE') or None
+PROFILE_STAGE = os.environ.get('FP_PROFILE') or None
+
+_stack = []
+
+
+def add_arguments(parser):
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='Append per-stage timing and memory records to this JSON-lines file')
+    parser.add_argument('--profile', default=None, metavar='STAGE',
+                        help='Also run this stage under cProfile (needs --trace)')
+
+
+def enable_from_args(args):
+    # For scripts that called `add_arguments`.
+    if args.trace:
+        enable(args.trace, args.profile)
+
+
+def enable(path, profile_stage=None):
+    global TRACE_PATH, PROFILE_STAGE
+    TRACE_PATH, PROFILE_STAGE = path, profile_stage
+    # Processes started later (pools, spawned workers) trace to the same file.
+    os.environ['FP_TRACE'] = path
+    if profile_stage is not None:
+        os.environ['FP_PROFILE'] = profile_stage
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+
+    def note(self, **info):
+        # Extra fields for the record, e.g. the number of items processed.
+        self.info.update(info)
+
+    def __enter__(self):
+        _stack.append(self.name)
+        self.path = '/'.join(_stack)
+        self.profile = (cProfile.Profile() if PROFILE_STAGE in (self.name, self.path)
+                        else None)
+        self.max_rss = _max_rss_mb()
+        self.start = time.time()
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        self.children_cpu = _children_cpu()
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is not None:
+            self.profile.disable()
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        children_cpu = _children_cpu() - self.children_cpu
+        _stack.pop()
+
+        # ru_maxrss is the peak over the whole life of the process: only its
+        # growth during the stage can be put down to the stage.
+        max_rss = _max_rss_mb()
+        record = {'stage': self.path, 'pid': os.getpid(), 'start': self.start,
+                  'wall': wall, 'cpu': cpu, 'children_cpu': children_cpu,
+                  'process_max_rss_mb': max_rss, 'rss_growth_mb': max_rss - self.max_rss,
+                  'ok': exc_type is None}
+        record.update(self.info)
+        if self.profile is not None:
+            record['profile'] = '%s.%s.%d.prof' % (os.path.splitext(TRACE_PATH)[0],
+                                                   self.path.replace('/', '.'), os.getpid())
+            self.profile.dump_stats(record['profile'])
+        _write(record)
+        return False
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _write(record):
+    # One append per record, so that concurrent processes do not interleave.
+    line = json.dumps(record) + '\n'
+    with open(TRACE_PATH, 'a') as f:
+        f.write(line)
+
+
+def stage(name, **info):
+    # with stage('fit', points=n): ... records wall and CPU time (own and of
+    # finished child processes) and how much it raised the peak RSS of the
+    # process.
+    if TRACE_PATH is None:
+        return _NULL_STAGE
+    return _Stage(name, info)
+
+
+def read_trace(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarise(records):
+    # Per stage path: calls, total / mean / max wall time, total CPU time and
+    # the largest growth of the peak RSS; ordered by total wall time.
+    summary = {}
+    for r in records:
+        s = summary.setdefault(r['stage'], {'calls': 0, 'wall': 0.0, 'max_wall': 0.0,
+                                            'cpu': 0.0, 'rss_growth_mb': 0.0, 'failed': 0})
+        s['calls'] += 1
+        s['wall'] += r['wall']
+        s['max_wall'] = max(s['max_wall'], r['wall'])
+        s['cpu'] += r['cpu'] + r.get('children_cpu', 0.0)
+        s['rss_growth_mb'] = max(s['rss_growth_mb'], r.get('rss_growth_mb', 0.0))
+        s['failed'] += not r['ok']
+    return sorted(summary.items(), key=lambda item: -item[1]['wall'])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='trace', description='Summarise a FP_TRACE file')
+    parser.add_argument('trace', help='JSON-lines trace file')
+    args = parser.parse_args()
+
+    rows = summarise(read_trace(args.trace))
+    width = max([5] + [len(name) for name, _ in rows])
+    print('%-*s  %5s  %10s  %10s  %10s  %10s  %9s' %
+          (width, 'stage', 'calls', 'wall (s)', 'mean (s)', 'max (s)', 'cpu (s)', 'peak +MB'))
+    for name, s in rows:
+        print('%-*s  %5d  %10.3f  %10.3f  %10.3f  %10.3f  %9.1f%s' %
+              (width, name, s['calls'], s['wall'], s['wall'] / s['calls'], s['max_wall'],
+               s['cpu'], s['rss_growth_mb'], '  (%d failed)' % s['failed'] if s['failed'] else ''))
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.nmilog import load_results
+
+
+DLL = os.path.join('bin', 'Release', 'netcoreapp2.0', 'FlashProfileDemo.dll')
+
+# Grid of `make clustering`; every mu is also run at the baseline theta.
+MUS = [1 + 0.5 * i for i in range(9)]
+THETAS = [1 + 0.25 * i for i in range(9)]
+QUICK_MUS = [1, 2, 3, 4, 5]
+QUICK_THETAS = [1 + 0.25 * i for i in range(5)]
+BASELINE_THETA = 10
+
+
+def log_path(root_dir, mu, theta):
+    # The name the clustering command writes: doubles print like %g.
+    return os.path.join(root_dir, 'logs', 'NMI-%gx%g.log' % (mu, theta))
+
+
+def is_complete(path, min_clusters=2, max_clusters=8):
+    # A log is complete once it has the Avg(NMI) summary of every N; the
+    # clustering command truncates it when it starts.
+    try:
+        with open(path, 'rb') as f:
+            done = sum(1 for line in f if line.startswith(b'Avg(NMI) = '))
+    except OSError:
+        return False
+    return done >= max_clusters - min_clusters + 1
+
+
+def mem_available_gb():
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / float(1 << 20)
+    except OSError:
+        pass
+    return None
+
+
+def pool_size(jobs, mem_per_run):
+    # Bounded by cores and by how many runs fit into the available memory.
+    workers = os.cpu_count() or 1
+    if jobs:
+        workers = min(workers, jobs)
+    available = mem_available_gb()
+    if available is not None and mem_per_run > 0:
+        workers = min(workers, int(available // mem_per_run))
+    return max(1, workers)
+
+
+def grid(mus, thetas, baseline_theta):
+    points = [(mu, theta) for mu in mus for theta in thetas]
+    if baseline_theta is not None:
+        points += [(mu, baseline_theta) for mu in mus if (mu, baseline_theta) not in points]
+    # Larger mu and theta sample more and run longer: start those first.
+    return sorted(points, key=lambda p: -p[0] * p[1])
+
+
+def run_point(args, mu, theta):
+    out_dir = os.path.join(args['root_dir'], 'logs', 'sweep')
+    os.makedirs(out_dir, exist_ok=True)
+    command = [args['dotnet'], args['dll'], 'clustering', '-u', '%g' % mu, '-e', '%g' % theta,
+               '-t', str(args['trials']), '-s', str(args['strings']),
+               '-m', str(args['min_clusters']), '-M', str(args['max_clusters'])]
+    start = time.time()
+    with open(os.path.join(out_dir, 'NMI-%gx%g.out' % (mu, theta)), 'w') as out:
+        code = subprocess.call(command, stdout=out, stderr=subprocess.STDOUT,
+                               cwd=args['root_dir'])
+    return code, time.time() - start
+
+
+def plot():
+    return subprocess.call([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         '..', 'plotting', 'plot.py'), 'clustering'])
+
+
+def main(args):
+    root_dir = args['root_dir']
+    if args['quick']:
+        args['mus'], args['thetas'] = args['mus'] or QUICK_MUS, args['thetas'] or QUICK_THETAS
+    points = grid(args['mus'] or MUS, args['thetas'] or THETAS,
+                  None if args['baseline_theta'] <= 0 else args['baseline_theta'])
+
+    def complete(mu, theta):
+        return is_complete(log_path(root_dir, mu, theta), args['min_clusters'], args['max_clusters'])
+
+    done = [p for p in points if complete(*p)]
+    todo = [p for p in points if p not in done]
+    print('> %d grid points: %d already complete, %d to run' % (len(points), len(done), len(todo)))
+
+    # Finished logs are summarised into the NMI cache as they complete, so the
+    # final plot (and any plot taken mid-sweep) only reads new logs.
+    load_results([log_path(root_dir, *p) for p in done], root_dir)
+
+    failed = []
+    if todo:
+        if not os.path.exists(args['dll']):
+            print('! %s not found; run `dotnet build -c Release` first' % args['dll'])
+            return 1
+        workers = min(len(todo), pool_size(args['jobs'], args['mem_per_run']))
+        print('+ Running on %d workers ...' % workers)
+        with ThreadPoolExecutor(workers) as executor:
+            futures = {executor.submit(run_point, args, mu, theta): (mu, theta) for (mu, theta) in todo}
+            for i, future in enumerate(as_completed(futures), 1):
+                mu, theta = futures[future]
+                code, seconds = future.result()
+                if code != 0 or not complete(mu, theta):
+                    failed.append((mu, theta))
+                    print('! [%d/%d] mu=%g theta=%g FAILED (exit %d, see logs/sweep/)' %
+                          (i, len(todo), mu, theta, code))
+                    continue
+                done.append((mu, theta))
+                load_results([log_path(root_dir, *p) for p in done], root_dir)
+                print('> [%d/%d] mu=%g theta=%g done in %0.0f s' % (i, len(todo), mu, theta, seconds))
+                if args['plot_every'] and i % args['plot_every'] == 0 and i < len(todo):
+                    plot()
+
+    if args['plot'] and not failed:
+        plot()
+    if failed:
+        print('! %d grid points failed: %s' % (len(failed), ', '.join('%gx%g' % p for p in failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    root_dir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..', '..'))
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='sweep')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Most concurrent runs (default: number of cores)')
+    parser.add_argument('--mem-per-run', type=float, default=4.0,
+                        help='GB of available memory to budget per run')
+    parser.add_argument('--quick', action='store_true',
+                        help='The smaller grid of `make quick-clustering`')
+    parser.add_argument('--mus', type=float, nargs='+', default=None)
+    parser.add_argument('--thetas', type=float, nargs='+', default=None)
+    parser.add_argument('--baseline-theta', type=float, default=BASELINE_THETA,
+                        help='Also run every mu at this theta (0 to skip)')
+    parser.add_argument('-t', '--trials', type=int, default=10)
+    parser.add_argument('-s', '--strings', type=int, default=256)
+    parser.add_argument('-m', '--min-clusters', type=int, default=2)
+    parser.add_argument('-M', '--max-clusters', type=int, default=8)
+    parser.add_argument('--dotnet', default='dotnet')
+    parser.add_argument('--dll', default=os.path.join(root_dir, DLL))
+    parser.add_argument('--plot-every', type=int, default=0,
+                        help='Re-plot after every this many finished runs')
+    parser.add_argument('--no-plot', dest='plot', action='store_false')
+    args = parser.parse_args()
+    args.root_dir = root_dir
+
+    sys.exit(main(args.__dict__))
@@ -2,123 +2,131 @@
 
 import os
 import sys
-import xmltodict
 
 import numpy as np
-import matplotlib as mpl
-mpl.use('Agg')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import render
 import matplotlib.pyplot as pl
 
-from jsonpath_rw import parse
-from operator import itemgetter
-
-root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
-
-with open(os.path.join(root_dir, 'TestResult.xml'), 'r') as f:
-    j = xmltodict.parse(f.read(), force_cdata=True)
-
-testcase_path = parse('$.."test-case"')
-testcases = testcase_path.find(j)[0].value
-
-data = []
-for t in testcases:
-    name = os.path.splitext(os.path.basename(t['@name']))[0]
-    duration = t['@duration']
-    clusters, avg_len, entries, auto = [e.split('=')[1]
-                                        for e in t['output']['#text'].split(',')]
-
-    entry = {'name': name,
-             'duration': float(duration),
-             'clusters': int(clusters),
-             'avg_len': float(avg_len),
-             'entries': int(entries),
-             'auto': auto == 'True'}
-    data.append(entry)
-
-print('> Number of tasks :: %3d' % len(data))
-print('> Number of tasks that took <= 2s :: %3d' %
-      (sum(e['duration'] <= 2 for e in data)))
-print('> Max time for all tasks :: %0.3f s' %
-      (np.max([e['duration'] for e in data])))
-print('> Median time for all tasks :: %0.3f s' %
-      (np.median([e['duration'] for e in data])))
-print('')
-
-print('> Number of AUTO tasks :: %3d' %
-      len([1 for e in data if e['auto']]))
-print('> Number of AUTO tasks that took <= 2s :: %3d' %
-      (sum(e['duration'] <= 2 for e in data if e['auto'])))
-print('> Max time for AUTO tasks :: %0.3f s' %
-      (np.max([e['duration'] for e in data if e['auto']])))
-print('> Median time for AUTO tasks :: %0.3f s' %
-      (np.median([e['duration'] for e in data if e['auto']])))
-print('')
-
-print('> Number of REFINE tasks :: %3d' %
-      len([1 for e in data if not e['auto']]))
-print('> Number of REFINE tasks that took <= 2s :: %3d' %
-      (sum(e['duration'] <= 2 for e in data if not e['auto'])))
-print('> Max time for REFINE tasks :: %0.3f s' %
-      (np.max([e['duration'] for e in data if not e['auto']])))
-print('> Median time for REFINE tasks :: %0.3f s' %
-      (np.median([e['duration'] for e in data if not e['auto']])))
-print('')
-
-l_dat = sorted(data, key=itemgetter('avg_len'))
-
-px = pl.figure(figsize=(12, 4))
-sp = px.add_subplot(1, 1, 1)
-sp.set_yscale('log', basey=2)
-sp.set_xscale('log', basex=2)
-sp.set_ylabel('Profiling Time (s)', fontsize=25)
-sp.set_xlabel('Number of Strings in Dataset', fontsize=25)
-sp.tick_params(axis='both', which='major', labelsize=20)
-sp.grid(ls='dotted', alpha=0.75, which='both')
-
-args = {'marker': 'x', 'mew': 2, 'ms': 9, 'ls': '--', 'lw': 0, 'alpha': 0.8}
-auto_args = {'marker': 'o', 'ms': 5, 'ls': '--', 'lw': 0, 'alpha': 0.8}
-title_yoffset = -0.25
-
-x = [e['entries'] for e in l_dat if not e['auto']]
-y = [e['duration'] for e in l_dat if not e['auto']]
-sp.plot(x, y, 'r', **args)
-
-x = [e['entries'] for e in l_dat if e['auto']]
-y = [e['duration'] for e in l_dat if e['auto']]
-sp.plot(x, y, 'r', **auto_args)
-
-sp.axhline(y=2, ls='-', lw=4, c=(0, 0.8, 0), alpha=0.6)
-sp.set_yticks([2**i for i in range(-9, 11, 2)])
-
-leg = sp.legend(['Automatic', 'Refinement'], fontsize=20)
-
-plot_path = os.path.join(root_dir, 'plots', 'Fig.21__time-vs-strings.png')
-pl.savefig(plot_path, bbox_inches='tight', dpi=600)
-print('> "Profiling Time vs Dataset Size" plot saved to %s' % plot_path)
-
-
-px = pl.figure(figsize=(12, 4))
-sp = px.add_subplot(1, 1, 1)
-sp.set_yscale('log', basey=2)
-sp.set_xscale('log', basex=2)
-sp.set_ylabel('Profiling Time (s)', fontsize=25)
-sp.set_xlabel('Avg (Length of String) over Dataset', fontsize=25)
-sp.tick_params(axis='both', which='major', labelsize=20)
-sp.grid(ls='dotted', alpha=0.75, which='both')
-
-x = [e['avg_len'] for e in l_dat if not e['auto']]
-y = [e['duration'] for e in l_dat if not e['auto']]
-sp.plot(x, y, 'ro', **args)
-
-x = [e['avg_len'] for e in l_dat if e['auto']]
-y = [e['duration'] for e in l_dat if e['auto']]
-sp.plot(x, y, 'ro', **auto_args)
-
-sp.axhline(y=2, ls='-', lw=4, c=(0, 0.8, 0), alpha=0.6)
-sp.set_yticks([2**i for i in range(-9, 11, 2)])
-
-leg = sp.legend(['Automatic', 'Refinement'], fontsize=20)
-
-plot_path = os.path.join(root_dir, 'plots', 'Fig.22__time-vs-length.png')
-pl.savefig(plot_path, bbox_inches='tight', dpi=600)
-print('> "Profiling Time vs String Length" plot saved to %s' % plot_path)
+from common.testresult import read_test_cases
+
+
+FIGURES = ['Fig.21__time-vs-strings.png', 'Fig.22__time-vs-length.png']
+
+
+def inputs(args):
+    return [os.path.join(args['root_dir'], 'TestResult.xml')]
+
+
+def summarise(data, subset, percentiles=None):
+    durations, entries = data['duration'][subset], data['entries'][subset]
+    stats = {'count': len(durations), 'fast': np.count_nonzero(durations <= 2)}
+    if len(durations) > 0:
+        stats['max'], stats['median'] = durations.max(), np.median(durations)
+        if percentiles:
+            stats['percentiles'] = np.percentile(durations, percentiles)
+        stats['ms_per_string'] = 1000.0 * durations.sum() / max(1, entries.sum())
+    return stats
+
+
+def report(args):
+    data = read_test_cases(os.path.join(args['root_dir'], 'TestResult.xml'))
+    auto = data['auto']
+
+    for name, label, subset in (('', 'all ', slice(None)),
+                                 ('AUTO ', 'AUTO ', auto),
+                                 ('REFINE ', 'REFINE ', ~auto)):
+        stats = summarise(data, subset, args['percentiles'])
+        print('> Number of %stasks :: %3d' % (name, stats['count']))
+        print('> Number of %stasks that took <= 2s :: %3d' % (name, stats['fast']))
+        if stats['count'] > 0:
+            print('> Max time for %stasks :: %0.3f s' % (label, stats['max']))
+            print('> Median time for %stasks :: %0.3f s' % (label, stats['median']))
+            for q, v in zip(args['percentiles'] or [], stats.get('percentiles', [])):
+                print('> p%g time for %stasks :: %0.3f s' % (q, label, v))
+            print('> Time per string for %stasks :: %0.3f ms' % (label, stats['ms_per_string']))
+        print('')
+    return data
+
+
+def plot(args, data):
+    root_dir = args['root_dir']
+
+    l_dat = data[np.argsort(data['avg_len'], kind='stable')]
+    l_auto = l_dat['auto']
+
+    px = pl.figure(figsize=(12, 4))
+    sp = px.add_subplot(1, 1, 1)
+    sp.set_yscale('log', basey=2)
+    sp.set_xscale('log', basex=2)
+    sp.set_ylabel('Profiling Time (s)', fontsize=25)
+    sp.set_xlabel('Number of Strings in Dataset', fontsize=25)
+    sp.tick_params(axis='both', which='major', labelsize=20)
+    sp.grid(ls='dotted', alpha=0.75, which='both')
+
+    refine_args = {'marker': 'x', 'mew': 2, 'ms': 9, 'ls': '--', 'lw': 0, 'alpha': 0.8}
+    auto_args = {'marker': 'o', 'ms': 5, 'ls': '--', 'lw': 0, 'alpha': 0.8}
+    title_yoffset = -0.25
+
+    x = l_dat['entries'][~l_auto]
+    y = l_dat['duration'][~l_auto]
+    sp.plot(x, y, 'r', **refine_args)
+
+    x = l_dat['entries'][l_auto]
+    y = l_dat['duration'][l_auto]
+    sp.plot(x, y, 'r', **auto_args)
+
+    sp.axhline(y=2, ls='-', lw=4, c=(0, 0.8, 0), alpha=0.6)
+    sp.set_yticks([2**i for i in range(-9, 11, 2)])
+
+    leg = sp.legend(['Automatic', 'Refinement'], fontsize=20)
+
+    plot_path = os.path.join(root_dir, 'plots', FIGURES[0])
+    render.savefig(plot_path, 600, 'Profiling Time vs Dataset Size')
+
+
+    px = pl.figure(figsize=(12, 4))
+    sp = px.add_subplot(1, 1, 1)
+    sp.set_yscale('log', basey=2)
+    sp.set_xscale('log', basex=2)
+    sp.set_ylabel('Profiling Time (s)', fontsize=25)
+    sp.set_xlabel('Avg (Length of String) over Dataset', fontsize=25)
+    sp.tick_params(axis='both', which='major', labelsize=20)
+    sp.grid(ls='dotted', alpha=0.75, which='both')
+
+    x = l_dat['avg_len'][~l_auto]
+    y = l_dat['duration'][~l_auto]
+    sp.plot(x, y, 'ro', **refine_args)
+
+    x = l_dat['avg_len'][l_auto]
+    y = l_dat['duration'][l_auto]
+    sp.plot(x, y, 'ro', **auto_args)
+
+    sp.axhline(y=2, ls='-', lw=4, c=(0, 0.8, 0), alpha=0.6)
+    sp.set_yticks([2**i for i in range(-9, 11, 2)])
+
+    leg = sp.legend(['Automatic', 'Refinement'], fontsize=20)
+
+    plot_path = os.path.join(root_dir, 'plots', FIGURES[1])
+    render.savefig(plot_path, 600, 'Profiling Time vs String Length')
+
+
+def main(args):
+    plot(args, report(args))
+
+
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='performance')
+    parser.add_argument('-p', '--percentiles', type=float, nargs='*', default=None,
+                        help='Also report these duration percentiles (default: 50 90 99)')
+    args = parser.parse_args()
+    args.root_dir = root_dir
+    if args.percentiles is not None and len(args.percentiles) == 0:
+        args.percentiles = [50, 90, 99]
+
+    main(args.__dict__)
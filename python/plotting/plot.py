@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+
+import glob
+import hashlib
+import importlib
+import json
+import os
+import sys
+import traceback
+import types
+
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.hashes import cache_dir, cached_file_hash, hash_memo, save_hash_memo
+from common.trace import add_arguments as add_trace_arguments, enable_from_args, stage
+
+
+# Subcommand -> plotting module; a module (and matplotlib, numpy, ...) is only
+# imported once its subcommand is run.
+COMMANDS = {
+    'data-stats': 'data_stats',
+    'clustering': 'clustering',
+    'quality': 'quality',
+    'similarity': 'similarity',
+    'performance': 'performance',
+}
+
+PYTHON_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+QUALITY_LOG = os.path.join('logs', 'Quality.FlashProfile.4.00x1.25.0.20.log')
+SIMILARITY_CASES = ['JaroWinkler', 'RF.6.12', 'RF.22.12', 'RF.44.12']
+
+
+def default_args(command, root_dir):
+    args = {'root_dir': root_dir, 'jobs': 1, 'percentiles': None}
+    if command == 'quality':
+        args['logs'] = [os.path.join(root_dir, QUALITY_LOG)]
+    elif command == 'similarity':
+        args['cases'] = list(SIMILARITY_CASES)
+    return args
+
+
+def cache_path(root_dir):
+    return os.path.join(cache_dir(root_dir), 'figures.json')
+
+
+def load_cache(root_dir):
+    try:
+        with open(cache_path(root_dir), 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    return {'figures': cache.get('figures', {})}
+
+
+def store_cache(root_dir, cache):
+    path = cache_path(root_dir)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(cache, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def sources(module):
+    # Source files of `module` and of every module of this repository that it
+    # uses, directly or not: render.py, the log parsers in common/, ...
+    found, todo = {}, [module]
+    while todo:
+        m = todo.pop()
+        if m.__name__ in found or getattr(m, '__file__', None) is None:
+            continue
+        path = os.path.abspath(m.__file__)
+        if not path.startswith(PYTHON_DIR + os.sep) or not os.path.isfile(path):
+            continue
+        found[m.__name__] = path
+        for value in vars(m).values():
+            if isinstance(value, types.ModuleType):
+                name = value.__name__
+            else:
+                name = getattr(value, '__module__', None)
+            if isinstance(name, str) and name in sys.modules:
+                todo.append(sys.modules[name])
+    return sorted(found.values())
+
+
+def figure_key(module, args, preview, hashes):
+    # Hash of the plotting code and everything it uses, its parameters and the
+    # content of every input file that the module declares; the figures change
+    # only if this does.
+    root_dir = args['root_dir']
+    params = {k: v for (k, v) in args.items() if k not in ('root_dir', 'jobs')}
+    h = hashlib.sha1(json.dumps([params, preview], sort_keys=True).encode('utf-8'))
+    for path in sources(module):
+        h.update(os.path.relpath(path, PYTHON_DIR).encode('utf-8', 'surrogateescape'))
+        h.update(cached_file_hash(path, hashes).encode('ascii'))
+    paths = sorted({path for pattern in module.inputs(args) for path in glob.glob(pattern)
+                    if os.path.isfile(path)})
+    for path in paths:
+        h.update(os.path.relpath(path, root_dir).encode('utf-8', 'surrogateescape'))
+        h.update(cached_file_hash(path, hashes).encode('ascii'))
+    return h.hexdigest()
+
+
+def render_figures(command, args, preview=False, cache=None, force=False):
+    # Prints the text summary of `command`, then renders its figures unless
+    # `cache` holds the same key for it and they all exist (or `force`).
+    # Returns the key and the hash memo.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import render
+    render.setup(preview)
+    module = importlib.import_module(COMMANDS[command])
+
+    if cache is None:
+        cache = {'figures': {}}
+    hashes = hash_memo(args['root_dir'])
+    with stage('plot.cache_key', command=command):
+        key = figure_key(module, args, preview, hashes)
+    with stage('plot.%s.report' % command):
+        data = module.report(args)
+    if (not force and cache['figures'].get(command) == key and
+            all(os.path.exists(os.path.join(args['root_dir'], 'plots', figure))
+                for figure in module.FIGURES)):
+        print('> "%s" figures are up to date (cache hit): %s' % (command, ', '.join(module.FIGURES)))
+    else:
+        with stage('plot.%s' % command):
+            module.plot(args, data)
+    return key, hashes
+
+
+def main(args):
+    if args['command'] == 'all':
+        tasks = [(command, default_args(command, args['root_dir'])) for command in COMMANDS]
+    else:
+        command_args = default_args(args['command'], args['root_dir'])
+        for key in ('logs', 'cases', 'percentiles'):
+            if args.get(key):
+                command_args[key] = args[key]
+        if args.get('scan_jobs'):
+            command_args['jobs'] = args['scan_jobs']
+        tasks = [(args['command'], command_args)]
+
+    # With --force every figure is re-rendered, but the cache is still updated.
+    cache = load_cache(args['root_dir'])
+    failed, rendered = [], {}
+    if args['jobs'] > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(min(args['jobs'], len(tasks))) as executor:
+            futures = [(command, executor.submit(render_figures, command, command_args,
+                                                 args['preview'], cache, args['force']))
+                       for (command, command_args) in tasks]
+            for command, future in futures:
+                try:
+                    rendered[command] = future.result()
+                except Exception:
+                    traceback.print_exc()
+                    failed.append(command)
+    else:
+        for command, command_args in tasks:
+            try:
+                rendered[command] = render_figures(command, command_args, args['preview'],
+                                                   cache, args['force'])
+            except Exception:
+                if len(tasks) == 1:
+                    raise
+                traceback.print_exc()
+                failed.append(command)
+
+    for command, (key, hashes) in rendered.items():
+        cache['figures'][command] = key
+        hash_memo(args['root_dir']).update(hashes)
+    if rendered:
+        store_cache(args['root_dir'], cache)
+        save_hash_memo(args['root_dir'])
+
+    if failed:
+        print('! Failed to render: %s' % ', '.join(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='plot')
+    parser.add_argument('--preview', action='store_true',
+                        help='Render at a low dpi for a quick look')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of figures to render in parallel (with `all`)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render even if the inputs of a figure are unchanged')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    subparsers.add_parser('all', help='Render every figure with default inputs')
+    sub = subparsers.add_parser('data-stats', help='Fig. 16')
+    sub.add_argument('--scan-jobs', dest='scan_jobs', type=int, default=None,
+                     help='Number of processes to scan modified datasets with')
+    subparsers.add_parser('clustering', help='Fig. 18, 21(a), 21(b)')
+    sub = subparsers.add_parser('quality', help='Fig. 19')
+    sub.add_argument('logs', nargs='*', default=None,
+                     help='Quality.FlashProfile.*.log files to compare; the first is plotted')
+    sub = subparsers.add_parser('similarity', help='Fig. 17(a)')
+    sub.add_argument('cases', nargs='*', default=None,
+                     help='Baselines to plot against FlashProfile')
+    sub = subparsers.add_parser('performance', help='Fig. 21, 22')
+    sub.add_argument('-p', '--percentiles', type=float, nargs='*', default=None,
+                     help='Also report these duration percentiles (default: 50 90 99)')
+
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+    args.root_dir = root_dir
+    enable_from_args(args)
+    if getattr(args, 'percentiles', None) == []:
+        args.percentiles = [50, 90, 99]
+
+    sys.exit(main(args.__dict__))
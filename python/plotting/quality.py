@@ -4,49 +4,81 @@ import os
 import sys
 
 import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import render
 import matplotlib.pyplot as pl
 
-root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+from common.qualitylog import precision_recall_f1, read_quality_log, summarise
+
+FIGURES = ['Fig.19__quality.png']
+
+
+def inputs(args):
+    return list(args['logs'])
+
+
+def report(args):
+    if len(args['logs']) > 1:
+        print('> %-60s %6s %6s %5s %4s %8s %9s %8s %8s' %
+              ('log', 'mu', 'theta', 'frac', 'sets', 'score', 'precision', 'recall', 'F1'))
+        for row in summarise(args['logs']):
+            print('> %-60s %6.2f %6.2f %5.2f %4d %8.4f %9.4f %8.4f %8.4f' % tuple(row))
+    return read_quality_log(args['logs'][0])
+
+
+def plot(args, log):
+    root_dir = args['root_dir']
+    if len(args['logs']) > 1:
+        print('> Plotting %s' % args['logs'][0])
+
+    f = pl.figure(1, figsize=(15, 5))
+    p = f.add_subplot(1, 1, 1)
+    p.tick_params(axis='both', which='major', labelsize=24)
+    p.set_ylabel('Match Fraction', fontsize=26)
+    p.set_xlabel('Dataset Id', fontsize=26)
+
+    match, mismatch, f1 = log.match, log.mismatch, log.reported_f1
+    if np.isnan(f1):
+        f1 = precision_recall_f1(match, mismatch)[2]
+
+    p.fill_between(range(len(match)), match, mismatch,
+                   facecolor='green', alpha=0.32)
+    p.fill_between(range(len(match)), mismatch, 0.0,
+                   facecolor='#880000', alpha=0.96)
 
-f = pl.figure(1, figsize=(15, 5))
-p = f.add_subplot(1, 1, 1)
-p.tick_params(axis='both', which='major', labelsize=24)
-p.set_ylabel('Match Fraction', fontsize=26)
-p.set_xlabel('Dataset Id', fontsize=26)
+    # p.text(23, 1.04, u"F1 = %0.2f%%" % (f1 * 100), color='#cc0000', fontweight='bold', fontsize=36)
+    # p.text(0, 1.04, u"F1 = %0.2f%%" % (f1 * 100), color='#cc0000', fontweight='bold', fontsize=36)
+    p.text(23, 0.45, u"F1 = %0.2f%%" % (f1 * 100),
+           color='green', fontweight='bold', fontsize=36)
 
+    p.axhline(y=np.mean(match), ls='dashed', lw=3,
+              c='green', alpha=0.9, dashes=(4, 4))
+    p.axhline(y=np.mean(mismatch), ls='dotted', lw=3,
+              c='red', alpha=0.9, dashes=(1, 3))
+    p.set_yticks(list(p.get_yticks())[2:] + [np.mean(match), np.mean(mismatch)])
 
-def filterLine(prefix, lines):
-    for line in lines:
-        if line.startswith(prefix):
-            yield float(line[len(prefix):])
+    p.set_autoscale_on(False)
+    p.axis([0, 62, 0, 1.005])
+    p.xaxis.set_ticks(np.arange(0, 62, 5))
 
+    plot_path = os.path.join(root_dir, 'plots', FIGURES[0])
+    render.savefig(plot_path, 300, 'Profiling Quality')
 
-with open(sys.argv[1]) as f:
-    data = f.readlines()
-    f1 = float(data[-1].split('=')[1])
-    match = list(filterLine('    + Match = ', data))
-    mismatch = list(filterLine('    + Mismatch = ', data))
 
-p.fill_between(range(len(match)), match, mismatch,
-               facecolor='green', alpha=0.32)
-p.fill_between(range(len(match)), mismatch, 0.0,
-               facecolor='#880000', alpha=0.96)
+def main(args):
+    plot(args, report(args))
 
-# p.text(23, 1.04, u"F1 = %0.2f%%" % (f1 * 100), color='#cc0000', fontweight='bold', fontsize=36)
-# p.text(0, 1.04, u"F1 = %0.2f%%" % (f1 * 100), color='#cc0000', fontweight='bold', fontsize=36)
-p.text(23, 0.45, u"F1 = %0.2f%%" % (f1 * 100),
-       color='green', fontweight='bold', fontsize=36)
 
-p.axhline(y=np.mean(match), ls='dashed', lw=3,
-          c='green', alpha=0.9, dashes=(4, 4))
-p.axhline(y=np.mean(mismatch), ls='dotted', lw=3,
-          c='red', alpha=0.9, dashes=(1, 3))
-p.set_yticks(list(p.get_yticks())[2:] + [np.mean(match), np.mean(mismatch)])
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
 
-p.set_autoscale_on(False)
-p.axis([0, 62, 0, 1.005])
-p.xaxis.set_ticks(np.arange(0, 62, 5))
+    import argparse
+    parser = argparse.ArgumentParser(prog='quality')
+    parser.add_argument('logs', nargs='+',
+                        help='Quality.FlashProfile.*.log files to compare; the first is plotted')
+    args = parser.parse_args()
+    args.root_dir = root_dir
 
-plot_path = os.path.join(root_dir, 'plots', 'Fig.19__quality.png')
-pl.savefig(plot_path, bbox_inches='tight', dpi=300)
-print('> "Profiling Quality" plot saved to %s' % plot_path)
+    main(args.__dict__)
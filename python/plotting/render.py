@@ -0,0 +1,25 @@
+import os
+
+import matplotlib as mpl
+mpl.use('Agg')
+
+from common.trace import stage
+
+
+PREVIEW_DPI = 72
+
+preview = False
+
+
+def setup(preview_mode=False):
+    global preview
+    preview = preview_mode
+
+
+def savefig(plot_path, dpi, description):
+    import matplotlib.pyplot as pl
+    os.makedirs(os.path.dirname(plot_path), exist_ok=True)
+    with stage('render', figure=os.path.basename(plot_path), dpi=PREVIEW_DPI if preview else dpi):
+        pl.savefig(plot_path, bbox_inches='tight', dpi=PREVIEW_DPI if preview else dpi)
+        pl.close()
+    print('> "%s" plot saved to %s' % (description, plot_path))
@@ -1,62 +1,104 @@
 #!/usr/bin/python3
 
-import matplotlib.pyplot as pl
-import numpy as np
 import os
 import sys
 
-from sklearn.metrics import auc, precision_recall_curve
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import render
+import matplotlib.pyplot as pl
+
+from common.metrics import pr_auc, precision_recall, read_curve
+from common.simlog import load_similarity_log
+
+
+FIGURES = ['Fig.17(a)__similarity.png']
+
+
+def inputs(args):
+    logs_dir = os.path.join(args['root_dir'], 'logs')
+    return ([os.path.join(logs_dir, 'Similarity.FlashProfile.log'),
+             os.path.join(logs_dir, 'Similarity.FlashProfilePR.log')] +
+            [os.path.join(logs_dir, 'Similarity.%sPR.log' % case) for case in args['cases']])
+
+
+def read_case(root_dir, case):
+    # The AUC is the one test.py computed on the full curve, which may have
+    # been written downsampled.
+    case_precision, case_recall, case_auc = read_curve(
+        os.path.join(root_dir, 'logs', 'Similarity.%sPR.log' % case))
+    return (case_auc, case_recall, case_precision)
+
+
+def report(args):
+    root_dir = args['root_dir']
+
+    # test.py already writes the FlashProfile curve, with the AUC of the full
+    # curve; recompute it only if that is missing, older than the log or has
+    # no recorded AUC.
+    log_path = os.path.join(root_dir, 'logs', 'Similarity.FlashProfile.log')
+    pr_path = os.path.join(root_dir, 'logs', 'Similarity.FlashProfilePR.log')
+    curve = None
+    if os.path.exists(pr_path) and os.path.getmtime(pr_path) >= os.path.getmtime(log_path):
+        with open(pr_path, 'r') as f:
+            if f.readline().startswith('# AUC = '):
+                curve = read_case(root_dir, 'FlashProfile')
+    if curve is None:
+        log = load_similarity_log(log_path, with_strings=False)
+        precision, recall, _ = precision_recall(log.labels, log.scores)
+        curve = (pr_auc(precision, recall), recall, precision)
+
+    curves = [curve] + [read_case(root_dir, name) for name in args['cases']]
+    for name, (auc, _, _) in zip(['FlashProfile'] + args['cases'], curves):
+        print('> AUC(%s) = %f' % (name, auc))
+    return curves
+
+
+def plot(args, curves):
+    root_dir = args['root_dir']
+    (auc, recall, precision), base_data = curves[0], curves[1:]
+
+    x = -0.02
+    y = 0.300
+    d = 0.0725
 
-pr_auc = auc
-root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+    p = pl.figure(figsize=(9, 6))
+    p_auc = p.add_subplot(1, 1, 1)
+    p_auc.set_autoscale_on(False)
+    p_auc.axis([0, 1, 0, 1.025])
 
-with open(os.path.join(root_dir, 'logs', 'Similarity.FlashProfile.log')) as f:
-    val = {'True': 1, 'False': 0}
-    data = f.read().split('\n')[:-1]
-    labels = [val[s.split('|')[0].strip()] for s in data[::3]]
-    times = np.fromiter((int(s.split('[')[1].split(']')[0])
-                         for s in data[::3]), int)
-    predictions = np.fromiter((float(s.split(' :: ')[0].split(' @ ')[1])
-                               for s in data[::3]), float)
-    precision, recall, _ = precision_recall_curve(labels, predictions)
-auc = pr_auc(recall, precision)
+    line_args = {'alpha': 0.5, 'lw': 4}
+    text_args = {'fontsize': 20, 'fontweight': 'bold', 'family': 'monospace'}
 
+    p_auc.tick_params(axis='both', which='major', labelsize=20)
+    p_auc.set_ylabel('Precision', fontsize=22)
+    p_auc.set_xlabel('Recall', fontsize=22)
 
-def read_case(case):
-    with open(os.path.join(root_dir, 'logs', 'Similarity.%sPR.log' % case), 'r') as f:
-        case_precision, case_recall = zip(
-            *(tuple(map(float, line.split('\t')))
-              for line in f.read().split('\n')[1:] if len(line) > 0))
-    return (pr_auc(case_recall, case_precision), case_recall, case_precision)
+    p_auc.plot(recall, precision, color='green', ls='-', **line_args)
 
+    colors_data = ['brown', 'red', 'purple', 'blue']
+    ls = [(1, 1), (2.5, 1.25, 1, 1.25), (2, 2), (5, 2)]
 
-x = -0.02
-y = 0.300
-d = 0.0725
+    for i, (auc, recall, precision) in enumerate(base_data):
+        p_auc.plot(recall, precision, color=colors_data[i], dashes=ls[i], **line_args)
 
-p = pl.figure(figsize=(9, 6))
-p_auc = p.add_subplot(1, 1, 1)
-p_auc.set_autoscale_on(False)
-p_auc.axis([0, 1, 0, 1.025])
+    leg = p_auc.legend(['FlashProfile'] + args['cases'], fontsize=15)
 
-args = {'alpha': 0.5, 'lw': 4}
-text_args = {'fontsize': 20, 'fontweight': 'bold', 'family': 'monospace'}
+    plot_path = os.path.join(root_dir, 'plots', FIGURES[0])
+    render.savefig(plot_path, 600, 'Accuracy of Similarity Prediction')
 
-p_auc.tick_params(axis='both', which='major', labelsize=20)
-p_auc.set_ylabel('Precision', fontsize=22)
-p_auc.set_xlabel('Recall', fontsize=22)
 
-p_auc.plot(recall, precision, color='green', ls='-', **args)
+def main(args):
+    plot(args, report(args))
 
-colors_data = ['brown', 'red', 'purple', 'blue']
-ls = [(1, 1), (2.5, 1.25, 1, 1.25), (2, 2), (5, 2)]
 
-base_data = [read_case(name) for name in sys.argv[1:]]
-for i, (auc, recall, precision) in enumerate(base_data):
-    p_auc.plot(recall, precision, color=colors_data[i], dashes=ls[i], **args)
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
 
-leg = p_auc.legend(['FlashProfile'] + sys.argv[1:], fontsize=15)
+    import argparse
+    parser = argparse.ArgumentParser(prog='similarity')
+    parser.add_argument('cases', nargs='*', help='Baselines to plot against FlashProfile')
+    args = parser.parse_args()
+    args.root_dir = root_dir
 
-plot_path = os.path.join(root_dir, 'plots', 'Fig.17(a)__similarity.png')
-pl.savefig(plot_path, bbox_inches='tight', dpi=600)
-print('> "Accuracy of Similarity Prediction" plot saved to %s' % plot_path)
+    main(args.__dict__)
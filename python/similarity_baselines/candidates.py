@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+
+import os
+import sys
+
+import numpy as np
+
+from sklearn.neighbors import KDTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.datasets import load_dataset
+from features import batch_features, string_counts
+from scoring import jaro_winkler_scores, load_model, predict_models
+from store import load_counts
+
+
+class CandidateIndex:
+    # A KD-tree (L1 distance) over the distinct `string_counts` rows of a
+    # dataset. Strings with equal counts share a node; `members(u)` lists the
+    # rows of all strings with the u-th distinct count vector.
+
+    def __init__(self, counts, leaf_size=40):
+        unique, inverse = np.unique(counts, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self.order = np.argsort(inverse, kind='stable')
+        self.starts = np.zeros(len(unique) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=len(unique)), out=self.starts[1:])
+        self.tree = KDTree(unique.astype(np.float64), leaf_size=leaf_size, metric='manhattan')
+        self.num_unique = len(unique)
+
+    def members(self, u):
+        return self.order[self.starts[u]:self.starts[u + 1]]
+
+    def query(self, counts, candidates=100):
+        # For every row of `counts`, the rows of (at most) `candidates` strings
+        # whose count vectors are nearest to it, nearest first.
+        k = min(candidates, self.num_unique)
+        _, nearest = self.tree.query(np.asarray(counts, dtype=np.float64).reshape(-1, counts.shape[-1]),
+                                     k=k, sort_results=True)
+        results = []
+        for row in nearest:
+            rows, total = [], 0
+            for u in row:
+                rows.append(self.members(u)[:candidates - total])
+                total += len(rows[-1])
+                if total >= candidates:
+                    break
+            results.append(np.concatenate(rows))
+        return results
+
+
+def jaro_winkler_scorer(jobs=1):
+    def score(strings_1, strings_2):
+        return jaro_winkler_scores(list(zip(strings_1, strings_2)), jobs)
+    return score
+
+
+def model_scorer(model, jobs=1):
+    def score(strings_1, strings_2):
+        return predict_models([model], batch_features(strings_1, strings_2), jobs)[0]
+    return score
+
+
+def top_k(index, strings, queries, score, k=10, candidates=100):
+    # The k strings most similar to each query by `score`, among the
+    # `candidates` nearest to it in the index; as [(score, row), ...] lists.
+    results = []
+    for query, rows in zip(queries, index.query(string_counts(queries), candidates)):
+        scores = score([query] * len(rows), [strings[r] for r in rows])
+        best = np.argsort(-scores, kind='stable')[:k]
+        results.append([(float(scores[i]), int(rows[i])) for i in best])
+    return results
+
+
+def main(args):
+    strings = load_dataset(args['dataset'], args['root_dir'])
+    index = CandidateIndex(load_counts([args['dataset']], args['root_dir'])[0])
+    print('> Indexed %d strings (%d distinct count vectors)' % (len(strings), index.num_unique))
+
+    if args['model'] is None:
+        name, score = 'JaroWinkler', jaro_winkler_scorer(args['jobs'])
+    else:
+        num_sim_pairs, num_dis_pairs = (int(n) for n in args['model'].split(','))
+        name = 'RF.%d.%d' % (num_sim_pairs, num_dis_pairs)
+        score = model_scorer(load_model(os.path.join(
+            args['root_dir'], 'logs', 'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs))),
+            args['jobs'])
+
+    for query, best in zip(args['query'], top_k(index, strings, args['query'], score,
+                                                args['k'], args['candidates'])):
+        print('\n> Top %d by %s for "%s":' % (len(best), name, query))
+        for s, row in best:
+            print('  %0.4f  "%s"' % (s, strings[row]))
+
+
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='candidates')
+    parser.add_argument('-k', type=int, default=10, help='Strings to return per query')
+    parser.add_argument('-c', '--candidates', type=int, default=100,
+                        help='Nearest strings (by feature counts) to score per query')
+    parser.add_argument('-m', '--model', default=None, metavar='SIM,DIS',
+                        help='Score with RandomForest.<sim>.<dis>.pkl instead of JaroWinkler')
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('dataset', help='A tests/*/*.json dataset')
+    parser.add_argument('query', nargs='+', help='Strings to find similar strings for')
+    args = parser.parse_args()
+    args.root_dir = root_dir
+
+    main(args.__dict__)
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+# Columns of the per-string count matrix built by `string_counts`.
+LENGTH, DIGITS, LOWERS, UPPERS, SPACES, DOTS, COMMAS, HYPHENS = range(8)
+FIRST_LOWER, FIRST_UPPER, FIRST_DIGIT = range(8, 11)
+
+NUM_COUNTS = 8
+NUM_FEATURES = 11
+
+
+def get_features(s1, s2):
+    def digits(s): return sum(c.isdigit() for c in s)
+
+    def lowers(s): return sum(c.islower() for c in s)
+
+    def uppers(s): return sum(c.isupper() for c in s)
+
+    def spaces(s): return sum(c.isspace() for c in s)
+
+    def dots(s): return sum(c == '.' for c in s)
+
+    def commas(s): return sum(c == ',' for c in s)
+
+    def hyphens(s): return sum(c == '-' for c in s)
+
+    def dist(f): return abs(f(s1) - f(s2))
+
+    return [
+        dist(len),
+        dist(digits), dist(lowers), dist(uppers),
+        dist(spaces), dist(dots), dist(commas), dist(hyphens),
+        s1[0].islower() and s2[0].islower(),
+        s1[0].isupper() and s2[0].isupper(),
+        s1[0].isdigit() and s2[0].isdigit()
+    ]
+
+
+def string_counts(strings):
+    # All characters of all strings are laid out in a single array, classified
+    # once, and then binned back to their owning string.
+    strings = list(strings)
+    counts = np.zeros((len(strings), NUM_FEATURES), dtype=np.int32)
+    if len(strings) == 0:
+        return counts
+
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    counts[:, LENGTH] = lengths
+    if lengths.sum() == 0:
+        return counts
+
+    chars = np.frombuffer(''.join(strings).encode('utf-32-le', 'surrogatepass'), dtype='<U1')
+    owner = np.repeat(np.arange(len(strings)), lengths)
+    first = np.cumsum(lengths) - lengths
+    nonempty = lengths > 0
+
+    def count(mask): return np.bincount(owner, weights=mask, minlength=len(strings))
+
+    is_digit = np.char.isdigit(chars)
+    is_lower = np.char.islower(chars)
+    is_upper = np.char.isupper(chars)
+
+    counts[:, DIGITS] = count(is_digit)
+    counts[:, LOWERS] = count(is_lower)
+    counts[:, UPPERS] = count(is_upper)
+    counts[:, SPACES] = count(np.char.isspace(chars))
+    counts[:, DOTS] = count(chars == '.')
+    counts[:, COMMAS] = count(chars == ',')
+    counts[:, HYPHENS] = count(chars == '-')
+
+    counts[nonempty, FIRST_LOWER] = is_lower[first[nonempty]]
+    counts[nonempty, FIRST_UPPER] = is_upper[first[nonempty]]
+    counts[nonempty, FIRST_DIGIT] = is_digit[first[nonempty]]
+    return counts
+
+
+def pair_features(counts, left, right, out=None):
+    # Same 11 columns as `get_features`, for the pairs (counts[left], counts[right]).
+    if out is None:
+        out = np.empty((len(left), NUM_FEATURES), dtype=np.float32)
+    a, b = counts[left], counts[right]
+    np.abs(a[:, :NUM_COUNTS] - b[:, :NUM_COUNTS], out=out[:, :NUM_COUNTS],
+           casting='unsafe')
+    np.bitwise_and(a[:, NUM_COUNTS:], b[:, NUM_COUNTS:], out=out[:, NUM_COUNTS:],
+                   casting='unsafe')
+    return out
+
+
+def batch_features(strings_1, strings_2):
+    # Features of the pairs zip(strings_1, strings_2), counting each distinct
+    # string once.
+    strings_1, strings_2 = list(strings_1), list(strings_2)
+    index = {}
+    inverse = np.fromiter((index.setdefault(s, len(index)) for s in strings_1 + strings_2),
+                          dtype=np.int64, count=len(strings_1) + len(strings_2))
+    counts = string_counts(list(index))
+    return pair_features(counts, inverse[:len(strings_1)], inverse[len(strings_1):])
+
+
+def packed_features(strings, chunk_size=1 << 16):
+    # `batch_features` of the pairs (strings[2i], strings[2i + 1]) of a
+    # PackedStrings, decoding only `chunk_size` pairs at a time.
+    num_pairs = len(strings) // 2
+    features = np.empty((num_pairs, NUM_FEATURES), dtype=np.float32)
+    for start in range(0, num_pairs, chunk_size):
+        stop = min(num_pairs, start + chunk_size)
+        chunk = strings.slice(2 * start, 2 * stop).tolist()
+        features[start:stop] = batch_features(chunk[::2], chunk[1::2])
+    return features
@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+
+from collections import namedtuple
+
+from features import NUM_FEATURES, pair_features
+
+
+# `left` and `right` are (m, 2) arrays of (file id, row id); `labels` is 1 for
+# pairs drawn from the same file and 0 otherwise.
+Pairs = namedtuple('Pairs', ['left', 'right', 'labels'])
+
+
+def first_combinations(n, k):
+    # Positions of the first k elements of itertools.combinations(range(n), 2).
+    k = min(k, n * (n - 1) // 2)
+    per_first = np.arange(n - 1, 0, -1, dtype=np.int64)
+    ends = np.cumsum(per_first)
+    used = int(np.searchsorted(ends, k)) + 1 if k > 0 else 0
+    first = np.repeat(np.arange(used), per_first[:used])[:k]
+    second = np.arange(k) - (ends - per_first)[first] + first + 1
+    return first, second
+
+
+def count_pairs(sizes, num_sim_pairs, num_dis_pairs):
+    sizes = np.asarray(sizes, dtype=np.int64)
+    num_sim = np.minimum(num_sim_pairs, sizes * (sizes - 1) // 2).sum()
+    heads = np.minimum(num_dis_pairs, sizes)
+    num_dis = heads.sum() ** 2 - (heads ** 2).sum()
+    return int(num_sim), int(num_dis)
+
+
+def sample_pairs(sizes, num_sim_pairs, num_dis_pairs, rng=random):
+    # Draws the same pairs as shuffling every dataset and taking the first
+    # combinations (positive) and the product of the heads of two different
+    # datasets (negative), but only ever materialises row indices.
+    num_sim, num_dis = count_pairs(sizes, num_sim_pairs, num_dis_pairs)
+    left = np.empty((num_sim + num_dis, 2), dtype=np.int32)
+    right = np.empty((num_sim + num_dis, 2), dtype=np.int32)
+    labels = np.zeros(num_sim + num_dis, dtype=np.int8)
+
+    def shuffled(n):
+        rows = list(range(n))
+        rng.shuffle(rows)
+        return np.array(rows, dtype=np.int32)
+
+    k = 0
+    for i, size in enumerate(sizes):
+        rows = shuffled(size)
+        first, second = first_combinations(size, num_sim_pairs)
+        left[k:k + len(first)] = np.column_stack((np.full(len(first), i), rows[first]))
+        right[k:k + len(first)] = np.column_stack((np.full(len(first), i), rows[second]))
+        labels[k:k + len(first)] = 1
+        k += len(first)
+
+        heads = rows[:num_dis_pairs]
+        for j, size_2 in enumerate(sizes):
+            if j == i:
+                continue
+            heads_2 = shuffled(size_2)[:num_dis_pairs]
+            m = len(heads) * len(heads_2)
+            left[k:k + m, 0], left[k:k + m, 1] = i, np.repeat(heads, len(heads_2))
+            right[k:k + m, 0], right[k:k + m, 1] = j, np.tile(heads_2, len(heads))
+            k += m
+
+    return Pairs(left, right, labels)
+
+
+def build_features(counts, offsets, pairs, out=None, chunk_size=1 << 20):
+    # `counts` stacks the `string_counts` of every file, and `offsets[f]` is the
+    # first row of file f within it.
+    if out is None:
+        out = np.empty((len(pairs.labels), NUM_FEATURES), dtype=np.float32)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    for start in range(0, len(pairs.labels), chunk_size):
+        left = pairs.left[start:start + chunk_size]
+        right = pairs.right[start:start + chunk_size]
+        pair_features(counts,
+                      offsets[left[:, 0]] + left[:, 1],
+                      offsets[right[:, 0]] + right[:, 1],
+                      out=out[start:start + chunk_size])
+    return out
@@ -0,0 +1,107 @@
+import multiprocessing
+
+import jellyfish as jelly
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.externals import joblib
+
+
+_scores = None
+_strings = None
+
+
+def _init_worker(scores, strings=None):
+    global _scores, _strings
+    _scores, _strings = scores, strings
+
+
+def _score_chunk(start, pairs):
+    out = np.frombuffer(_scores, dtype=np.float64)
+    out[start:start + len(pairs)] = [jelly.jaro_winkler(*p) for p in pairs]
+
+
+def _score_packed(start, pair_indices):
+    _score_chunk(start, [(_strings[2 * i], _strings[2 * i + 1]) for i in pair_indices.tolist()])
+
+
+def _run(scores, strings, function, chunks, jobs):
+    if jobs <= 1 or len(chunks) <= 1:
+        _init_worker(scores, strings)
+        for chunk in chunks:
+            function(*chunk)
+    else:
+        with multiprocessing.Pool(jobs, initializer=_init_worker,
+                                  initargs=(scores, strings)) as pool:
+            pool.starmap(function, chunks)
+    return np.frombuffer(scores, dtype=np.float64)
+
+
+def jaro_winkler_scores(pairs, jobs=1, chunk_size=1 << 14):
+    # Scores every distinct pair once, in chunks spread over `jobs` processes
+    # that write into a shared array, and broadcasts back to `pairs` order.
+    index = {}
+    inverse = np.fromiter((index.setdefault(p, len(index)) for p in pairs),
+                          dtype=np.int64, count=len(pairs))
+    unique = list(index)
+    del index
+
+    scores = multiprocessing.RawArray('d', max(1, len(unique)))
+    chunks = [(start, unique[start:start + chunk_size])
+              for start in range(0, len(unique), chunk_size)]
+    return _run(scores, None, _score_chunk, chunks, jobs)[inverse]
+
+
+def distinct_pairs(strings, chunk_size=1 << 16):
+    # For the pairs (strings[2i], strings[2i + 1]) of a PackedStrings: the
+    # first pair with each distinct (s1, s2), and for every pair which of those
+    # it repeats. Strings are decoded a chunk at a time and only the distinct
+    # ones are kept, to number them.
+    ids = {}
+    string_ids = np.empty(len(strings), dtype=np.int64)
+    for start in range(0, len(strings), chunk_size):
+        chunk = strings.slice(start, min(len(strings), start + chunk_size)).tolist()
+        string_ids[start:start + len(chunk)] = [ids.setdefault(s, len(ids)) for s in chunk]
+    num_pairs = len(strings) // 2
+    keys = string_ids[0:2 * num_pairs:2] * max(1, len(ids)) + string_ids[1:2 * num_pairs:2]
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1)
+
+
+def packed_jaro_winkler_scores(strings, jobs=1, chunk_size=1 << 14):
+    # `jaro_winkler_scores` of the pairs (strings[2i], strings[2i + 1]) of a
+    # PackedStrings. Only pair indices are sent to the workers, which decode
+    # the strings of the distinct pairs they score.
+    first, inverse = distinct_pairs(strings)
+    scores = multiprocessing.RawArray('d', max(1, len(first)))
+    chunks = [(start, first[start:start + chunk_size])
+              for start in range(0, len(first), chunk_size)]
+    return _run(scores, strings, _score_packed, chunks, jobs)[inverse]
+
+
+def load_model(path):
+    # Prediction parallelism is managed by `predict_models` rather than by
+    # each forest.
+    model = joblib.load(path)
+    model.n_jobs = 1
+    return model
+
+
+def predict_models(models, features, jobs=1, chunk_size=1 << 16):
+    # Predictions of every model over one contiguous float32 copy of
+    # `features`, computed in fixed-size row chunks on `jobs` threads (tree
+    # traversal releases the GIL).
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    predictions = np.empty((len(models), len(features)), dtype=np.float64)
+
+    def predict(task):
+        m, start = task
+        predictions[m, start:start + chunk_size] = \
+            models[m].predict(features[start:start + chunk_size])
+
+    tasks = [(m, start) for m in range(len(models))
+             for start in range(0, len(features), chunk_size)]
+    with ThreadPoolExecutor(max(1, jobs)) as executor:
+        for _ in executor.map(predict, tasks):
+            pass
+    return predictions
@@ -0,0 +1,305 @@
+#!/usr/bin/python3
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from features import batch_features
+from scoring import load_model, predict_models
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+def percentiles(values, qs=(50, 90, 99)):
+    if len(values) == 0:
+        return {}
+    return {'p%g' % q: v for (q, v) in zip(qs, np.percentile(values, qs).tolist())}
+
+
+class Batcher:
+    # Queues the pairs of concurrent requests and scores them together: a
+    # batch is closed once it holds `max_batch` pairs or `max_delay` seconds
+    # after its first request, and is featurised and predicted in one call.
+
+    def __init__(self, names, models, max_batch=1 << 14, max_delay=0.001, jobs=1):
+        self.names, self.models = names, models
+        self.max_batch, self.max_delay, self.jobs = max_batch, max_delay, jobs
+        self.queue = asyncio.Queue()
+        self.batches, self.batched_pairs = 0, 0
+
+    def _score(self, pairs):
+        features = batch_features([p[0] for p in pairs], [p[1] for p in pairs])
+        return predict_models(self.models, features, self.jobs)
+
+    async def score(self, pairs):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((pairs, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_delay
+        while size < self.max_batch:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, size = await self._next_batch()
+            start = time.perf_counter()
+            try:
+                scores = await loop.run_in_executor(
+                    None, self._score, [pair for (pairs, _, _) in batch for pair in pairs])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            compute = time.perf_counter() - start
+            self.batches += 1
+            self.batched_pairs += size
+
+            k = 0
+            for pairs, future, queued in batch:
+                if not future.done():
+                    future.set_result((scores[:, k:k + len(pairs)], start - queued, compute, size))
+                k += len(pairs)
+
+
+class ScoringServer:
+
+    def __init__(self, batcher, history=1 << 16):
+        self.batcher = batcher
+        self.requests, self.pairs = 0, 0
+        self.latencies = deque(maxlen=history)
+
+    async def dispatch(self, method, target, body):
+        if target == '/score':
+            if method != 'POST':
+                return 405, {'error': 'POST a JSON {"pairs": [[s1, s2], ...]}'}
+            return await self.score(body)
+        if target == '/stats':
+            return 200, self.stats()
+        if target == '/models':
+            return 200, {'models': self.batcher.names}
+        return 404, {'error': 'unknown path %s' % target}
+
+    async def score(self, body):
+        received = time.perf_counter()
+        try:
+            pairs = json.loads(body.decode('utf-8'))['pairs']
+            pairs = [(str(s1), str(s2)) for (s1, s2) in pairs]
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': 'bad request: %s' % e}
+
+        if pairs:
+            scores, queued, compute, batch_size = await self.batcher.score(pairs)
+        else:
+            scores, queued, compute, batch_size = np.zeros((len(self.batcher.names), 0)), 0.0, 0.0, 0
+        latency = time.perf_counter() - received
+
+        self.requests += 1
+        self.pairs += len(pairs)
+        self.latencies.append(latency)
+        return 200, {
+            'scores': dict(zip(self.batcher.names, scores.tolist())),
+            'latency_ms': 1000 * latency,
+            'queue_ms': 1000 * queued,
+            'compute_ms': 1000 * compute,
+            'batch_pairs': batch_size,
+        }
+
+    def stats(self):
+        latencies = 1000 * np.array(self.latencies)
+        return {
+            'requests': self.requests,
+            'pairs': self.pairs,
+            'batches': self.batcher.batches,
+            'mean_batch_pairs': self.batcher.batched_pairs / max(1, self.batcher.batches),
+            'latency_ms': percentiles(latencies),
+        }
+
+    async def handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: one JSON response per request.
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target = line.decode('latin-1').split()[:2]
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except Exception as e:
+                    status, payload = 500, {'error': repr(e)}
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n\r\n' %
+                             (status, REASONS[status].encode('ascii'), len(data)) + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def request(reader, writer, method, target, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    writer.write(b'%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 b'Content-Length: %d\r\n\r\n' % (method.encode('ascii'), target.encode('ascii'),
+                                                   len(body)) + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+async def connect(args):
+    if args['unix']:
+        return await asyncio.open_unix_connection(args['unix'])
+    return await asyncio.open_connection(args['host'], args['port'])
+
+
+async def load_test(args, strings):
+    # `connections` concurrent clients, each sending `requests` requests of
+    # `pairs` random pairs of `strings` over one keep-alive connection.
+    rng = np.random.RandomState(0)
+    latencies = []
+
+    async def client():
+        reader, writer = await connect(args)
+        try:
+            for _ in range(args['requests']):
+                idx = rng.randint(0, len(strings), (args['pairs'], 2))
+                start = time.perf_counter()
+                status, payload = await request(reader, writer, 'POST', '/score',
+                                                {'pairs': [[strings[a], strings[b]] for a, b in idx]})
+                if status != 200:
+                    raise RuntimeError(payload.get('error'))
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(args['connections'])])
+    wall = time.perf_counter() - start
+    pairs = len(latencies) * args['pairs']
+    print('> %d requests, %d pairs in %0.3f s: %0.1f pairs/s, %0.2f us/pair' %
+          (len(latencies), pairs, wall, pairs / wall, 1e6 * wall / max(1, pairs)))
+    for name, value in sorted(percentiles(1000 * np.array(latencies)).items()):
+        print('> %s request latency :: %0.3f ms' % (name, value))
+
+    reader, writer = await connect(args)
+    print('> Server stats: %s' % json.dumps((await request(reader, writer, 'GET', '/stats'))[1]))
+    writer.close()
+
+
+async def serve(args):
+    names, models = [], []
+    for pair in args['sim-dis-combination']:
+        num_sim_pairs, num_dis_pairs = (int(n) for n in pair.split(','))
+        names.append('RF.%d.%d' % (num_sim_pairs, num_dis_pairs))
+        models.append(load_model(os.path.join(
+            args['root_dir'], 'logs', 'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs))))
+
+    batcher = Batcher(names, models, args['max_batch'], args['max_delay'] / 1000.0, args['jobs'])
+    server = ScoringServer(batcher)
+    if args['unix']:
+        listener = await asyncio.start_unix_server(server.handle, args['unix'])
+        where = args['unix']
+    else:
+        listener = await asyncio.start_server(server.handle, args['host'], args['port'])
+        where = 'http://%s:%d' % (args['host'], args['port'])
+    print('> Serving %s on %s' % (', '.join(names), where))
+    sys.stdout.flush()
+    batch_task = asyncio.ensure_future(batcher.run())
+    try:
+        await listener.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main(args):
+    if args['command'] == 'serve':
+        asyncio.run(serve(args))
+    else:
+        from common.datasets import load_data
+        from glob import glob
+        strings = [s for path in sorted(glob(os.path.join(args['root_dir'], 'tests', 'homo', '*.json')))
+                   for s in load_data(path, args['root_dir'])[:1000]]
+        asyncio.run(load_test(args, strings))
+
+
+if __name__ == '__main__':
+    root_dir = os.path.join(os.path.dirname(sys.argv[0]), '..', '..')
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, metavar='PATH',
+                        help='Listen on (or connect to) a Unix socket instead')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    sub = subparsers.add_parser('serve', help='Score string pairs with trained models')
+    sub.add_argument('-j', '--jobs', type=int, default=1,
+                     help='Threads to predict each batch with')
+    sub.add_argument('--max-batch', type=int, default=1 << 14,
+                     help='Most pairs scored in one batch')
+    sub.add_argument('--max-delay', type=float, default=1.0,
+                     help='Milliseconds a batch waits for more requests')
+    sub.add_argument('sim-dis-combination', nargs='+', help='Comma-separated pairs')
+
+    sub = subparsers.add_parser('load', help='Load-test a running server with tests/homo strings')
+    sub.add_argument('-c', '--connections', type=int, default=32)
+    sub.add_argument('-n', '--requests', type=int, default=100,
+                     help='Requests per connection')
+    sub.add_argument('-p', '--pairs', type=int, default=64,
+                     help='Pairs per request')
+
+    args = parser.parse_args()
+    args.root_dir = root_dir
+
+    main(args.__dict__)
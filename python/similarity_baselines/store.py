@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from common.datasets import ROOT_DIR, load_dataset
+from common.hashes import cache_dir, cached_file_hash, hash_memo, save_hash_memo
+from features import string_counts
+
+
+# Bump whenever `string_counts` changes.
+STORE_VERSION = 1
+
+
+def _store_path(store_dir, sha1):
+    return os.path.join(store_dir, '%s.v%d.npy' % (sha1, STORE_VERSION))
+
+
+def _save(path, counts):
+    # Counts are non-negative; most datasets fit in uint8 or uint16.
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, counts.astype(np.min_scalar_type(int(counts.max()) if counts.size else 0)))
+    os.replace(path + '.tmp', path)
+
+
+def load_counts(paths, root_dir=ROOT_DIR):
+    # `string_counts` of every dataset in `paths`, computed once per dataset
+    # content and then read back from the store (in the cache of root_dir) as
+    # int32 matrices.
+    store_dir = os.path.join(cache_dir(root_dir), 'counts')
+    counts = []
+    for path in paths:
+        stored = _store_path(store_dir, cached_file_hash(path, hash_memo(root_dir)))
+        try:
+            counts.append(np.load(stored).astype(np.int32))
+            continue
+        except (OSError, ValueError):
+            pass
+        # Counted once per distinct string, then broadcast to every row.
+        dataset = load_dataset(path, root_dir)
+        counts.append(string_counts(dataset.unique.tolist())[dataset.inverse])
+        try:
+            os.makedirs(store_dir, exist_ok=True)
+            _save(stored, counts[-1])
+        except OSError:
+            pass
+
+    save_hash_memo(root_dir)
+    return counts
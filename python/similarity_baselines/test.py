@@ -1,56 +1,52 @@
 #!/usr/bin/python3
 
-import jellyfish as jelly
-import numpy as np
 import os
 import sys
 
-from sklearn.externals import joblib
-from sklearn.metrics import auc, precision_recall_curve
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-from train import get_features
+from common.metrics import downsample, pr_auc, precision_recall, write_curve
+from common.simlog import load_similarity_log
+from common.trace import add_arguments as add_trace_arguments, enable_from_args, stage
+from features import packed_features
+from scoring import load_model, packed_jaro_winkler_scores, predict_models
 
 
 def main(args):
-    pairs = []
-    features, labels = [], []
     dist_predictions = []
 
-    val = {'True': 1, 'False': 0}
     sys.stdout.write('> Computing features for test data ...')
-    with open(args['flashprofile_output'], 'r') as f:
-        val = {'True': 1, 'False': 0}
-        data = f.read().split('\n')[:-1]
-        dist_predictions.append((
-            'FlashProfile',
-            np.fromiter((float(s.split(' :: ')[0].split(' @ ')[1])
-                         for s in data[::3]), float)))
-        labels.extend(val[s.split('|')[0].strip()] for s in data[::3])
-        strings = iter(s[11:-1] for (i, s) in enumerate(data) if i % 3 > 0)
-        for s1, s2 in zip(strings, strings):
-            features.append(get_features(s1, s2))
-            pairs.append((s1, s2))
-    print('\r> Feature vector computation DONE (on %d points)\n' % len(pairs))
+    with stage('test.load') as traced:
+        log = load_similarity_log(args['flashprofile_output'])
+        traced.note(pairs=len(log.labels))
+    labels = log.labels
+    dist_predictions.append(('FlashProfile', log.scores))
+    # The pair strings stay packed; both baselines decode them a chunk at a time.
+    with stage('test.features', pairs=len(labels)):
+        features = packed_features(log.strings)
+    print('\r> Feature vector computation DONE (on %d points)\n' % len(features))
 
-    dist_predictions.append(('JaroWinkler', [jelly.jaro_winkler(*p) for p in pairs]))
+    with stage('test.jaro_winkler', pairs=len(labels), jobs=args['jobs']):
+        dist_predictions.append(('JaroWinkler', packed_jaro_winkler_scores(log.strings, args['jobs'])))
 
+    names, models = [], []
     for pair in args['sim-dis-combination']:
         num_sim_pairs, num_dis_pairs = pair.split(',')
         num_sim_pairs, num_dis_pairs = int(num_sim_pairs), int(num_dis_pairs)
-        model = joblib.load(os.path.join(
-            args['root_dir'], 'logs',
-            'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs)))
-        dist_predictions.append((
-            'RF.%d.%d' % (num_sim_pairs, num_dis_pairs),
-            model.predict(features)))
+        names.append('RF.%d.%d' % (num_sim_pairs, num_dis_pairs))
+        with stage('test.load_model', model=names[-1]):
+            models.append(load_model(os.path.join(
+                args['root_dir'], 'logs',
+                'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs))))
+    with stage('test.predict', pairs=len(features), models=len(models), jobs=args['jobs']):
+        dist_predictions.extend(zip(names, predict_models(models, features, args['jobs'])))
 
     for (dfile, predictions) in dist_predictions:
-        with open(os.path.join(args['root_dir'], 'logs', 'Similarity.%sPR.log' % dfile), 'w') as f:
-            f.write('precision\trecall\n')
-            precision, recall, _ = precision_recall_curve(labels, predictions)
-            for pr in zip(precision, recall):
-                f.write('%f\t%f\n' % pr)
-        vauc = auc(recall, precision, reorder=True)
+        with stage('test.pr_curve', baseline=dfile):
+            precision, recall, _ = precision_recall(labels, predictions)
+            vauc = pr_auc(precision, recall)
+            write_curve(os.path.join(args['root_dir'], 'logs', 'Similarity.%sPR.log' % dfile),
+                        *downsample(precision, recall, args['curve_points']), area=vauc)
         print('AUC(%s) = %f' % (dfile, vauc))
 
 
@@ -62,9 +58,15 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--flashprofile-output',
                         default=os.path.join(root_dir, 'logs',
                                              'Similarity.FlashProfile.log'))
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of cores to score baselines with')
+    parser.add_argument('-p', '--curve-points', type=int, default=None,
+                        help='Maximum number of points to write per PR curve')
     parser.add_argument('sim-dis-combination', nargs='+',
                         help='Comma-separated pairs')
+    add_trace_arguments(parser)
     args = parser.parse_args()
     args.root_dir = root_dir
+    enable_from_args(args)
 
     main(args.__dict__)
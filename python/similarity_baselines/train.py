@@ -1,88 +1,161 @@
 #!/usr/bin/python3
 
-import json
+import hashlib
 import os
 import random
 import sys
 
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
-from itertools import combinations, islice, product
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.externals import joblib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-SEED = 0xfaded
-
-
-def get_features(s1, s2):
-    def digits(s): return sum(c.isdigit() for c in s)
-
-    def lowers(s): return sum(c.islower() for c in s)
-
-    def uppers(s): return sum(c.isupper() for c in s)
+from common.trace import add_arguments as add_trace_arguments, enable_from_args, stage
+from features import NUM_FEATURES
+from pairs import Pairs, build_features, sample_pairs
+from store import load_counts
 
-    def spaces(s): return sum(c.isspace() for c in s)
 
-    def dots(s): return sum(c == '.' for c in s)
-
-    def commas(s): return sum(c == ',' for c in s)
+SEED = 0xfaded
 
-    def hyphens(s): return sum(c == '-' for c in s)
+_counts, _offsets, _sizes = None, None, None
+
+
+def _init_worker(counts, offsets):
+    global _counts, _offsets, _sizes
+    _counts, _offsets = counts, offsets
+    _sizes = np.diff(np.append(offsets, len(counts))).tolist()
+
+
+def combination_seed(num_sim_pairs, num_dis_pairs):
+    # Derived from SEED and the combination alone, so that every training set
+    # is the same whichever other combinations are trained, in whatever order.
+    digest = hashlib.sha256(('%d:%d:%d' % (SEED, num_sim_pairs, num_dis_pairs)).encode('ascii'))
+    return int.from_bytes(digest.digest()[:8], 'little')
+
+
+def fit_forest(pairs, n_jobs=1, features_file=None):
+    # Builds the whole feature matrix, in memory or, given `features_file`, in
+    # a memory-mapped .npy that the forest is then fitted from.
+    with stage('train.features', pairs=len(pairs.labels), memmap=features_file is not None):
+        out = None
+        if features_file is not None:
+            out = np.lib.format.open_memmap(features_file, mode='w+', dtype=np.float32,
+                                            shape=(len(pairs.labels), NUM_FEATURES))
+        features = build_features(_counts, _offsets, pairs, out)
+    try:
+        with stage('train.fit', pairs=len(pairs.labels), n_jobs=n_jobs):
+            return RandomForestRegressor(random_state=SEED, n_jobs=n_jobs).fit(features, pairs.labels)
+    finally:
+        if features_file is not None:
+            del features, out
+            os.remove(features_file)
+
+
+def fit_forest_incrementally(pairs, n_jobs=1, batch_size=1 << 20, trees_per_batch=10):
+    # Grows the forest with `trees_per_batch` more trees on every batch of at
+    # most `batch_size` (shuffled) pairs, so only one batch of features is ever
+    # held in memory.
+    n = len(pairs.labels)
+    batches = np.array_split(np.random.RandomState(SEED).permutation(n),
+                             max(1, -(-n // batch_size)))
+    features = np.empty((len(batches[0]), NUM_FEATURES), dtype=np.float32)
+    model = RandomForestRegressor(n_estimators=0, warm_start=True,
+                                  random_state=SEED, n_jobs=n_jobs)
+    for batch in batches:
+        batch.sort()
+        batch_pairs = Pairs(pairs.left[batch], pairs.right[batch], pairs.labels[batch])
+        with stage('train.features', pairs=len(batch)):
+            batch_matrix = build_features(_counts, _offsets, batch_pairs,
+                                           features[:len(batch)])
+        with stage('train.fit', pairs=len(batch), n_jobs=n_jobs, warm_start=True):
+            model.n_estimators += trees_per_batch
+            model.fit(batch_matrix, batch_pairs.labels)
+    return model
+
+
+def train_model(pairs, model_file, n_jobs=1, mode='memory', batch_size=1 << 20,
+                trees_per_batch=10):
+    if mode == 'warm-start':
+        model = fit_forest_incrementally(pairs, n_jobs, batch_size, trees_per_batch)
+    else:
+        model = fit_forest(pairs, n_jobs, (os.path.splitext(model_file)[0] + '.features.npy'
+                                           if mode == 'memmap' else None))
+    with stage('train.dump', model=os.path.basename(model_file)):
+        joblib.dump(model, model_file)
+    return model_file, len(pairs.labels)
 
-    def dist(f): return abs(f(s1) - f(s2))
 
-    return [
-        dist(len),
-        dist(digits), dist(lowers), dist(uppers),
-        dist(spaces), dist(dots), dist(commas), dist(hyphens),
-        s1[0].islower() and s2[0].islower(),
-        s1[0].isupper() and s2[0].isupper(),
-        s1[0].isdigit() and s2[0].isdigit()
-    ]
+def train_combination(num_sim_pairs, num_dis_pairs, model_file, n_jobs=1, **options):
+    with stage('train.sample', combination='%d,%d' % (num_sim_pairs, num_dis_pairs)) as traced:
+        pairs = sample_pairs(_sizes, num_sim_pairs, num_dis_pairs,
+                             random.Random(combination_seed(num_sim_pairs, num_dis_pairs)))
+        traced.note(pairs=len(pairs.labels))
+    return train_model(pairs, model_file, n_jobs, **options)
 
 
 def main(args):
-    random.seed(SEED)
-    for pair in args['sim-dis-combination']:
+    files = glob(os.path.join(args['root_dir'], 'tests', 'homo', '*.json'))
+    sys.stdout.write('+ Counting features ...')
+    sys.stdout.flush()
+    with stage('train.count', files=len(files)) as traced:
+        counts = load_counts(files, args['root_dir'])
+        traced.note(strings=sum(len(c) for c in counts))
+    sys.stdout.write('\r> Counting features DONE.\n')
+
+    sizes = [len(c) for c in counts]
+    offsets = np.cumsum([0] + sizes[:-1])
+    counts = np.concatenate(counts)
+
+    # Cores are split between concurrently trained combinations and the trees
+    # of each forest. Every combination samples its own pairs from its own
+    # seed, so the training sets do not depend on the number of workers.
+    combinations = args['sim-dis-combination']
+    options = {'mode': args['mode'], 'batch_size': args['batch_size'],
+               'trees_per_batch': args['trees_per_batch']}
+    workers = max(1, min(args['jobs'], len(combinations)))
+    n_jobs = max(1, args['jobs'] // workers)
+
+    if workers == 1:
+        _init_worker(counts, offsets)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                       initargs=(counts, offsets))
+
+    results = []
+    for pair in combinations:
         num_sim_pairs, num_dis_pairs = pair.split(',')
         num_sim_pairs, num_dis_pairs = int(num_sim_pairs), int(num_dis_pairs)
-        features, labels = [], []
 
-        files = glob(os.path.join(args['root_dir'], 'tests', 'homo', '*.json'))
         print('> +ve/-ve Ratio = %0.2f%%' %
               ((100.0 * num_sim_pairs) / (num_dis_pairs * num_dis_pairs * (len(files) - 1))))
 
-        for i, clean_file in enumerate(files):
-            sys.stdout.write('\r+ Feature vector computation @ %0.2f %%' %
-                             ((100.0 * i) / len(files)))
+        model_file = os.path.join(args['root_dir'], 'logs',
+                                  'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs))
+        if executor is None:
+            sys.stdout.write('\r+ Training ...')
             sys.stdout.flush()
+            results.append(train_combination(num_sim_pairs, num_dis_pairs, model_file, n_jobs,
+                                             **options))
+            sys.stdout.write('\r> Training DONE (%d data points).\n' % results[-1][1])
+        else:
+            results.append(executor.submit(train_combination, num_sim_pairs, num_dis_pairs,
+                                           model_file, n_jobs, **options))
 
-            with open(clean_file, 'r') as f:
-                data = json.load(f)['Data']
-                random.shuffle(data)
-                for pair in islice(combinations(data, 2), num_sim_pairs):
-                    features.append(get_features(*pair))
-                    labels.append(1)
-                for file_2 in files:
-                    if file_2 == clean_file:
-                        continue
-                    with open(file_2, 'r') as f:
-                        data_2 = json.load(f)['Data']
-                        random.shuffle(data_2)
-                    for pair in product(data[:num_dis_pairs], data_2[:num_dis_pairs]):
-                        features.append(get_features(*pair))
-                        labels.append(0)
-        sys.stdout.write('\r> Feature vector computation DONE.\n')
-
-        sys.stdout.write('\r+ Training ... (%d data points)' % len(labels))
-        sys.stdout.flush()
-        model = RandomForestRegressor(random_state=SEED).fit(features, labels)
-        sys.stdout.write('\r> Training DONE (%d data points).\n')
-
-        model_file = os.path.join(os.path.join(root_dir, 'logs'),
-            'RandomForest.%d.%d.pkl' % (num_sim_pairs, num_dis_pairs))
-        joblib.dump(model, model_file)
-        print('> Model saved to %s.\n' % model_file)
+    if executor is not None:
+        print('+ Training %d models on %d workers x %d jobs ...' %
+              (len(results), workers, n_jobs))
+        results = [r.result() for r in results]
+        executor.shutdown()
+
+    print('')
+    for model_file, num_points in results:
+        print('> Model saved to %s (%d data points).' % (model_file, num_points))
 
 
 if __name__ == '__main__':
@@ -90,8 +163,20 @@ if __name__ == '__main__':
 
     import argparse
     parser = argparse.ArgumentParser(prog='train')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of cores to train with')
+    parser.add_argument('-m', '--mode', choices=('memory', 'memmap', 'warm-start'),
+                        default='memory',
+                        help='Fit on an in-memory feature matrix, on a memory-mapped one '
+                             'next to the model, or grow the forest batch by batch')
+    parser.add_argument('--batch-size', type=int, default=1 << 20,
+                        help='Pairs per batch in warm-start mode')
+    parser.add_argument('--trees-per-batch', type=int, default=10,
+                        help='Trees added per batch in warm-start mode')
     parser.add_argument('sim-dis-combination', nargs='+', help='Comma-separated pairs')
+    add_trace_arguments(parser)
     args = parser.parse_args()
     args.root_dir = root_dir
+    enable_from_args(args)
 
     main(args.__dict__)